@@ -34,6 +34,7 @@ ALLOWED_HOSTS = []
 INSTALLED_APPS = [
     'django_extensions',
     'django.contrib.gis',
+    'django.contrib.postgres',
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
@@ -49,6 +50,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     "debug_toolbar.middleware.DebugToolbarMiddleware",
+    'app.middleware.QueryCountMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.locale.LocaleMiddleware',
@@ -110,6 +112,56 @@ DATABASES = {
 
 }
 
+# Read replicas for the read-only API endpoints, e.g. DB_REPLICA_NAMES=flight_db_replica.
+# Each one gets a `replica_<n>` alias with the credentials of `default`.
+DATABASE_REPLICAS = []
+
+for i, name in enumerate(filter(None, os.environ.get('DB_REPLICA_NAMES', '').split(','))):
+    alias = f'replica_{i}'
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        'NAME': name.strip(),
+        'HOST': os.environ.get('DB_REPLICA_HOST', DATABASES['default']['HOST']),
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['app.routers.ReplicaRouter']
+
+# Replicas lagging more than this are skipped and reads fall back to the primary
+REPLICA_MAX_LAG_SECONDS = float(os.environ.get('REPLICA_MAX_LAG_SECONDS', 5))
+REPLICA_LAG_CHECK_INTERVAL = float(os.environ.get('REPLICA_LAG_CHECK_INTERVAL', 1))
+
+# Connection pooling for the ASGI deployment, where one process serves many concurrent
+# requests. Requires psycopg 3 with the pool extra; enabled by setting DB_POOL_MAX_SIZE.
+DB_POOL_MAX_SIZE = int(os.environ.get('DB_POOL_MAX_SIZE', 0))
+
+if DB_POOL_MAX_SIZE:
+    for alias in ['default', *DATABASE_REPLICAS]:
+        DATABASES[alias]['OPTIONS'] = {
+            'pool': {
+                'min_size': int(os.environ.get('DB_POOL_MIN_SIZE', 4)),
+                'max_size': DB_POOL_MAX_SIZE,
+                'timeout': float(os.environ.get('DB_POOL_TIMEOUT', 10)),
+            },
+        }
+
+
+# Report per-request query counts in the X-DB-Query-Count header (used by the load_test command)
+EXPOSE_QUERY_COUNT = os.environ.get('EXPOSE_QUERY_COUNT', str(DEBUG)) == 'True'
+
+# Route statistics backend: 'table' keeps airport_stats up to date from signals on every
+# flight/ticket change, 'materialized_view' serves it from a materialized view refreshed
+# by the refresh_airport_stats command (bounded staleness, no per-row overhead on ingest).
+AIRPORT_STATS_BACKEND = os.environ.get('AIRPORT_STATS_BACKEND', 'table')
+
+# Seconds a process keeps its in-memory copy of airports and aircraft (app.registry);
+# changes made by other processes become visible after at most this long
+REFERENCE_REGISTRY_TTL = float(os.environ.get('REFERENCE_REGISTRY_TTL', 300))
+
+# Columnar flight snapshot for off-database analytics (export_flight_snapshot, app.snapshot)
+FLIGHT_SNAPSHOT_DIR = os.environ.get('FLIGHT_SNAPSHOT_DIR', BASE_DIR / 'snapshots' / 'flights')
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -0,0 +1,44 @@
+"""
+Production settings for FlightSystem: the development settings without the
+dev-only apps, so web workers and management commands neither import nor
+set up django_extensions and the debug toolbar.
+
+Select with DJANGO_SETTINGS_MODULE=FlightSystem.settings_production and compare
+start-up cost with `manage.py import_time_report --compare FlightSystem.settings
+--compare FlightSystem.settings_production`.
+"""
+import os
+
+from django.core.exceptions import ImproperlyConfigured
+
+from .settings import *  # noqa: F401,F403
+from .settings import INSTALLED_APPS, MIDDLEWARE
+
+
+def get_required_env(name):
+    value = os.environ.get(name, '').strip()
+    if not value:
+        raise ImproperlyConfigured(f"Set the {name} environment variable for the production settings.")
+    return value
+
+
+DEBUG = os.environ.get('DJANGO_DEBUG') == 'True'
+
+# Never falls back to the development key committed in FlightSystem.settings
+SECRET_KEY = get_required_env('DJANGO_SECRET_KEY')
+
+# Comma-separated, e.g. DJANGO_ALLOWED_HOSTS=flights.example.com,api.flights.example.com
+ALLOWED_HOSTS = [host.strip() for host in get_required_env('DJANGO_ALLOWED_HOSTS').split(',') if host.strip()]
+
+# Apps and middleware only useful while developing; FlightSystem.urls only adds
+# the debug toolbar URLs when its app is installed
+DEV_APPS = ['django_extensions', 'debug_toolbar']
+
+INSTALLED_APPS = [app for app in INSTALLED_APPS if app not in DEV_APPS]
+
+MIDDLEWARE = [middleware for middleware in MIDDLEWARE if not middleware.startswith('debug_toolbar.')]
+
+EXPOSE_QUERY_COUNT = os.environ.get('EXPOSE_QUERY_COUNT') == 'True'
+
+# Left to GDAL's own library lookup unless set; the development default is a Windows path
+GDAL_LIBRARY_PATH = os.environ.get('GDAL_LIBRARY_PATH')
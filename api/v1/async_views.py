@@ -0,0 +1,128 @@
+"""
+Async variants of the read-only API endpoints.
+
+These are plain Django async views (DRF views are synchronous) using the async
+ORM interface. Under ASGI a sync view runs whole in a sync_to_async thread; here
+only the ORM and authentication calls hop to a thread, which is all that is
+avoided: Django 5.1's async ORM is sync_to_async over the sync ORM, so every query
+still occupies a thread while it waits on the database.
+
+Requests are authenticated with the DEFAULT_AUTHENTICATION_CLASSES of the DRF
+views, and the views return the same payloads as their counterparts in `views.py`.
+"""
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+from rest_framework import exceptions
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from app.filters import AirportStatsFilter
+from app.routers import read_from_replica
+from .encoders import get_row_encoder
+from .serializers import AirportSerializer, AirportStatsResponseSerializer
+from .views import CustomPagination, get_airport_stats_queryset, get_airports_queryset, get_request_language
+
+
+def check_authenticated(request):
+    """
+    Authenticate the request with the DEFAULT_AUTHENTICATION_CLASSES, as the DRF views
+    do with IsAuthenticated. Returns the error response for an anonymous request or
+    failed authentication, None otherwise.
+    """
+    authenticators = [authenticator() for authenticator in api_settings.DEFAULT_AUTHENTICATION_CLASSES]
+    drf_request = Request(request, authenticators=authenticators)
+    try:
+        user = drf_request.user
+        if user and user.is_authenticated:
+            return None
+        error = exceptions.NotAuthenticated()
+    except exceptions.APIException as e:
+        error = e
+
+    response = JsonResponse({'detail': error.detail}, status=error.status_code)
+    # Same as APIView.handle_exception: 401 with a challenge if the first authenticator has one
+    if isinstance(error, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+        header = authenticators[0].authenticate_header(drf_request) if authenticators else None
+        if header:
+            response.status_code = 401
+            response['WWW-Authenticate'] = header
+        else:
+            response.status_code = 403
+    return response
+
+
+def get_page_bounds(query_params, count):
+    """
+    Return (page number, page count, offset, limit) for the page requested in
+    `query_params`, following CustomPagination, or None if the page is invalid.
+    """
+    try:
+        page_size = int(query_params.get(CustomPagination.page_size_query_param, CustomPagination.page_size))
+        if page_size <= 0:
+            raise ValueError
+        page_size = min(page_size, CustomPagination.max_page_size)
+    except ValueError:
+        page_size = CustomPagination.page_size
+
+    page_count = max(1, -(-count // page_size))
+
+    page = query_params.get('page', 1)
+    if page == 'last':
+        page = page_count
+    try:
+        page = int(page)
+    except (TypeError, ValueError):
+        return None
+    if page < 1 or page > page_count:
+        return None
+
+    return page, page_count, (page - 1) * page_size, page_size
+
+
+async def airport_list(request):
+    """
+    Async API endpoint that allows airports to be viewed.
+    """
+    error = await sync_to_async(check_authenticated)(request)
+    if error is not None:
+        return error
+
+    encoder = get_row_encoder(AirportSerializer)
+    queryset = get_airports_queryset(get_request_language()).values_list(*encoder.sources)
+
+    with read_from_replica():
+        rows = [row async for row in queryset]
+
+    return JsonResponse(encoder.encode(rows), safe=False)
+
+
+async def airport_statistics(request):
+    """
+    Async API endpoint that allows airport statistics to be viewed.
+    """
+    error = await sync_to_async(check_authenticated)(request)
+    if error is not None:
+        return error
+
+    query_params = request.GET
+    encoder = get_row_encoder(AirportStatsResponseSerializer)
+
+    queryset = get_airport_stats_queryset(get_request_language(), query_params)
+    filterset = AirportStatsFilter(query_params, queryset=queryset, request=request)
+    if not filterset.is_valid():
+        return JsonResponse(filterset.errors, status=400)
+    queryset = filterset.qs
+
+    with read_from_replica():
+        bounds = get_page_bounds(query_params, await queryset.acount())
+        if bounds is None:
+            return JsonResponse({'detail': 'Invalid page.'}, status=404)
+        page, page_count, offset, limit = bounds
+
+        rows = [row async for row in queryset.values_list(*encoder.sources)[offset:offset + limit]]
+
+    return JsonResponse({
+        'page': page,
+        'page_count': page_count,
+        'results': encoder.encode(rows),
+    })
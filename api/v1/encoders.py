@@ -0,0 +1,62 @@
+from django.utils.duration import duration_string
+from rest_framework import serializers
+
+
+# Serializer field classes whose to_representation can be replaced by a plain callable
+FIELD_CONVERTERS = {
+    serializers.CharField: str,
+    serializers.IntegerField: int,
+    serializers.FloatField: float,
+    serializers.DurationField: duration_string,
+}
+
+
+class RowEncoder:
+    """
+    Row encoder compiled once from a serializer's field declarations.
+
+    The encoder works on `values_list()` tuples whose columns come in the order of
+    `sources`, and produces the same dicts as `serializer_class(many=True).data` would
+    for the corresponding model instances, without per-row field lookups.
+    """
+
+    def __init__(self, serializer_class):
+        self.serializer_class = serializer_class
+        self.names = []
+        self.sources = []
+
+        namespace = {}
+        items = []
+
+        for index, (name, field) in enumerate(serializer_class().fields.items()):
+            if field.write_only:
+                continue
+            if field.source == '*' or '.' in field.source:
+                raise ValueError(f"{serializer_class.__name__}.{name}: source '{field.source}' is not a column")
+
+            converter = FIELD_CONVERTERS.get(type(field), field.to_representation)
+            namespace[f'_c{index}'] = converter
+
+            self.names.append(name)
+            self.sources.append(field.source)
+            column = f'row[{len(self.sources) - 1}]'
+            items.append(f'{name!r}: None if {column} is None else _c{index}({column})')
+
+        code = 'def encode(row):\n    return {' + ', '.join(items) + '}\n'
+        exec(code, namespace)
+        self.encode_row = namespace['encode']
+
+    def encode(self, rows):
+        encode_row = self.encode_row
+        return [encode_row(row) for row in rows]
+
+
+_encoders = {}
+
+
+def get_row_encoder(serializer_class):
+    """ Return the cached RowEncoder for a serializer class. """
+    encoder = _encoders.get(serializer_class)
+    if encoder is None:
+        encoder = _encoders[serializer_class] = RowEncoder(serializer_class)
+    return encoder
@@ -1,6 +1,12 @@
+import secrets
+from collections import Counter
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
 from rest_framework import serializers
 
-from app.models import Airport
+from api.v1.signals import add_passengers
+from app.models import Airport, AirportNetworkStats, Booking, Flight, Ticket, TicketFlight
 
 
 class AirportSerializer(serializers.ModelSerializer):
@@ -22,3 +28,215 @@ class AirportStatsResponseSerializer(serializers.Serializer):
     flights_count = serializers.IntegerField()
     passengers_count = serializers.IntegerField()
     flight_time = serializers.DurationField()
+
+
+class BookingSerializer(serializers.ModelSerializer):
+    """ Serializer for the Booking model. """
+
+    class Meta:
+        model = Booking
+        fields = ('book_ref', 'book_date', 'total_amount')
+
+
+class TicketFlightSerializer(serializers.ModelSerializer):
+    """ Serializer for a flight leg of a ticket. """
+
+    flight_id = serializers.IntegerField(source='flight_id.flight_id')
+    flight_no = serializers.CharField(source='flight_id.flight_no')
+    departure_airport = serializers.CharField(source='flight_id.departure_airport_id')
+    arrival_airport = serializers.CharField(source='flight_id.arrival_airport_id')
+    scheduled_departure = serializers.DateTimeField(source='flight_id.scheduled_departure')
+    scheduled_arrival = serializers.DateTimeField(source='flight_id.scheduled_arrival')
+    status = serializers.CharField(source='flight_id.status')
+
+    class Meta:
+        model = TicketFlight
+        fields = ('flight_id', 'flight_no', 'departure_airport', 'arrival_airport',
+                  'scheduled_departure', 'scheduled_arrival', 'status', 'fare_condition', 'amount')
+
+
+class PassengerSearchSerializer(serializers.ModelSerializer):
+    """ Serializer for a ticket found by passenger search, with its booking and flights. """
+
+    booking = BookingSerializer(source='book_ref')
+    flights = TicketFlightSerializer(source='ticketflight_set', many=True)
+
+    class Meta:
+        model = Ticket
+        fields = ('ticket_no', 'passenger_id', 'passenger_name', 'contact_data', 'booking', 'flights')
+
+
+class FlightBoardSerializer(serializers.ModelSerializer):
+    """ Serializer for a row of an airport departures/arrivals board. """
+
+    departure_airport = serializers.CharField(source='departure_airport_id')
+    arrival_airport = serializers.CharField(source='arrival_airport_id')
+    aircraft_code = serializers.CharField(source='aircraft_code_id')
+
+    class Meta:
+        model = Flight
+        fields = ('flight_id', 'flight_no', 'departure_airport', 'arrival_airport', 'status', 'aircraft_code',
+                  'scheduled_departure', 'scheduled_arrival', 'actual_departure', 'actual_arrival')
+
+
+class AirportNetworkStatsSerializer(serializers.ModelSerializer):
+    """ Serializer for the route network metrics of an airport. """
+
+    airport_code = serializers.CharField(source='airport_id')
+    airport_name = serializers.CharField(source='airport_name_translated')
+
+    class Meta:
+        model = AirportNetworkStats
+        fields = ('airport_code', 'airport_name', 'out_degree', 'in_degree', 'flights_count',
+                  'passengers_count', 'transfer_pairs', 'two_hop_reach', 'computed_at')
+
+
+class BookingLegSerializer(serializers.ModelSerializer):
+    """ Flight leg of a ticket in a new booking. """
+
+    flight_id = serializers.IntegerField(source='flight_id_id')
+    flight_no = serializers.CharField(source='flight_id.flight_no', read_only=True)
+    departure_airport = serializers.CharField(source='flight_id.departure_airport_id', read_only=True)
+    arrival_airport = serializers.CharField(source='flight_id.arrival_airport_id', read_only=True)
+    scheduled_departure = serializers.DateTimeField(source='flight_id.scheduled_departure', read_only=True)
+    amount = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=0)
+
+    class Meta:
+        model = TicketFlight
+        fields = ('flight_id', 'flight_no', 'departure_airport', 'arrival_airport', 'scheduled_departure',
+                  'fare_condition', 'amount')
+
+
+class BookingTicketSerializer(serializers.ModelSerializer):
+    """ Ticket of a new booking, with its flight legs. """
+
+    # Plain field: ModelSerializer's unique validator would run one query per ticket
+    ticket_no = serializers.CharField(max_length=13)
+    flights = BookingLegSerializer(source='legs', many=True, allow_empty=False)
+
+    class Meta:
+        model = Ticket
+        fields = ('ticket_no', 'passenger_id', 'passenger_name', 'contact_data', 'flights')
+
+
+class BookingCreateSerializer(serializers.ModelSerializer):
+    """
+    Serializer creating a booking with all its tickets and flight legs.
+
+    Flights, tickets and the booking reference are validated with one query each,
+    and everything is inserted with bulk operations in a single transaction, so the
+    number of queries does not grow with passengers or legs. References or ticket
+    numbers taken by a concurrent booking after validation are caught on insert:
+    generated references are retried, anything else is a validation error.
+    """
+
+    book_ref = serializers.CharField(max_length=6, required=False)
+    tickets = BookingTicketSerializer(many=True, allow_empty=False)
+
+    book_ref_attempts = 5
+
+    bookable_statuses = (
+        Flight.FlightStatusChoices.SCHEDULED, Flight.FlightStatusChoices.ONTIME, Flight.FlightStatusChoices.DELAYED,
+    )
+
+    class Meta:
+        model = Booking
+        fields = ('book_ref', 'book_date', 'total_amount', 'tickets')
+        read_only_fields = ('book_date', 'total_amount')
+
+    def validate_book_ref(self, value):
+        value = value.upper()
+        if Booking.objects.filter(book_ref=value).exists():
+            raise serializers.ValidationError('A booking with this reference already exists.')
+        return value
+
+    def validate_tickets(self, tickets):
+        ticket_nos = [ticket['ticket_no'] for ticket in tickets]
+        if len(set(ticket_nos)) != len(ticket_nos):
+            raise serializers.ValidationError('Ticket numbers must be unique.')
+
+        existing = list(Ticket.objects.filter(ticket_no__in=ticket_nos).values_list('ticket_no', flat=True))
+        if existing:
+            raise serializers.ValidationError(f"Tickets already exist: {', '.join(sorted(existing))}.")
+
+        flight_ids = {leg['flight_id_id'] for ticket in tickets for leg in ticket['legs']}
+        flights = Flight.objects.in_bulk(flight_ids)
+
+        errors = []
+        for ticket in tickets:
+            ticket_errors = []
+            seen = set()
+            for leg in ticket['legs']:
+                flight = flights.get(leg['flight_id_id'])
+                if flight is None:
+                    ticket_errors.append(f"Flight {leg['flight_id_id']} does not exist.")
+                elif flight.status not in self.bookable_statuses:
+                    ticket_errors.append(f"Flight {flight.flight_id} is {flight.status.lower()}.")
+                elif flight.flight_id in seen:
+                    ticket_errors.append(f"Flight {flight.flight_id} appears twice.")
+                else:
+                    leg['flight_id'] = flight
+                seen.add(leg['flight_id_id'])
+            errors.append({'flights': ticket_errors} if ticket_errors else {})
+
+        if any(errors):
+            raise serializers.ValidationError(errors)
+
+        self.flights = flights
+        return tickets
+
+    def create(self, validated_data):
+        legs = [leg for ticket in validated_data['tickets'] for leg in ticket['legs']]
+
+        with transaction.atomic():
+            booking = self.create_booking(validated_data.get('book_ref'), sum(leg['amount'] for leg in legs))
+
+            tickets = []
+            ticket_flights = []
+            for data in validated_data['tickets']:
+                ticket = Ticket(
+                    ticket_no=data['ticket_no'], book_ref=booking, passenger_id=data['passenger_id'],
+                    passenger_name=data['passenger_name'], contact_data=data['contact_data'],
+                )
+                # Signals are not sent by bulk_create; the denormalized departure is set here
+                ticket.legs = [
+                    TicketFlight(ticket_no=ticket, flight_id=leg['flight_id'], fare_condition=leg['fare_condition'],
+                                 amount=leg['amount'], scheduled_departure=leg['flight_id'].scheduled_departure)
+                    for leg in data['legs']
+                ]
+                tickets.append(ticket)
+                ticket_flights.extend(ticket.legs)
+
+            try:
+                with transaction.atomic():
+                    Ticket.objects.bulk_create(tickets)
+            except IntegrityError:
+                raise serializers.ValidationError({'tickets': ['Some of these tickets were created meanwhile.']})
+            TicketFlight.objects.bulk_create(ticket_flights)
+
+            # What update_flight_passenger_count does per ticket flight, once per flight and route
+            add_passengers(self.flights, Counter(leg['flight_id_id'] for leg in legs))
+
+        booking.tickets = tickets
+        return booking
+
+    def create_booking(self, book_ref, total_amount):
+        """ Insert the booking in a savepoint, so that a reference taken since validation can be retried. """
+        for _ in range(self.book_ref_attempts):
+            try:
+                with transaction.atomic():
+                    return Booking.objects.create(
+                        book_ref=book_ref or self.generate_book_ref(),
+                        book_date=timezone.now(),
+                        total_amount=total_amount,
+                    )
+            except IntegrityError:
+                if book_ref:
+                    raise serializers.ValidationError({'book_ref': ['A booking with this reference already exists.']})
+        raise serializers.ValidationError({'book_ref': ['Could not generate a free booking reference.']})
+
+    def generate_book_ref(self):
+        while True:
+            book_ref = secrets.token_hex(3).upper()
+            if not Booking.objects.filter(book_ref=book_ref).exists():
+                return book_ref
@@ -1,22 +1,179 @@
-from django.db import transaction
-from django.db.models.signals import post_save, post_delete
+from collections import Counter
+
+from django.db import connection, transaction
+from django.db.models import Case, F, IntegerField, Value, When
+from django.db.models.signals import post_save, post_delete, pre_save
 from django.dispatch import receiver
+import math
+
+from django.conf import settings
 from django.contrib.gis.measure import D
-from app.models import TicketFlight, AirportStats, Flight
+from app.models import TicketFlight, AirportStats, Flight, BoardingPass, Airport, Aircraft
+from app.registry import registry
 
 
 def calculate_distance(departure_airport, arrival_airport):
     """
     Calculate the distance in kilometers between two airports using their coordinates.
+    Takes AirportRecord instances from the reference registry.
     """
-    if not departure_airport.coordinates or not arrival_airport.coordinates:
+    if not departure_airport.has_coordinates or not arrival_airport.has_coordinates:
         return 0
 
-    # Using Django's geographic distance calculation
-    distance_in_km = D(m=departure_airport.coordinates.distance(arrival_airport.coordinates) * 100).km
+    # Same planar distance between the points as GEOSGeometry.distance
+    distance = math.hypot(
+        departure_airport.longitude - arrival_airport.longitude,
+        departure_airport.latitude - arrival_airport.latitude,
+    )
+    distance_in_km = D(m=distance * 100).km
     return distance_in_km
 
 
+# Flight fields AirportStats depends on, as field names and attnames
+FLIGHT_STATS_FIELDS = frozenset({
+    'departure_airport', 'arrival_airport', 'departure_airport_id', 'arrival_airport_id',
+    'scheduled_departure', 'scheduled_arrival', 'passenger_count',
+})
+
+
+def maintains_stats_table():
+    """
+    Whether AirportStats is a table kept up to date by these receivers. With the
+    materialized view backend it is refreshed by the refresh_airport_stats command instead.
+    """
+    return settings.AIRPORT_STATS_BACKEND == 'table'
+
+
+def add_passengers(flights, counts):
+    """
+    Add passengers to flights and their routes' AirportStats in bulk, as the receivers
+    below would one ticket flight at a time. `flights` maps flight ids to Flight
+    instances and `counts` flight ids to the number of new ticket flights.
+    Runs a constant number of queries however many flights and routes are affected.
+    """
+    if not counts:
+        return
+
+    Flight.objects.filter(flight_id__in=counts).update(passenger_count=F('passenger_count') + Case(
+        *[When(flight_id=flight_id, then=Value(count)) for flight_id, count in counts.items()],
+        output_field=IntegerField(),
+    ))
+
+    if not maintains_stats_table():
+        return
+
+    route_counts = Counter()
+    route_flights = {}
+    for flight_id, count in counts.items():
+        flight = flights[flight_id]
+        stats_key = f"{flight.departure_airport_id}-{flight.arrival_airport_id}"
+        route_counts[stats_key] += count
+        route_flights.setdefault(stats_key, flight)
+
+    existing = set(AirportStats.objects.filter(flight_id__in=route_counts).values_list('flight_id', flat=True))
+
+    if existing:
+        AirportStats.objects.filter(flight_id__in=existing).update(passengers_count=F('passengers_count') + Case(
+            *[When(flight_id=stats_key, then=Value(route_counts[stats_key])) for stats_key in existing],
+            output_field=IntegerField(),
+        ))
+
+    new_stats = []
+    for stats_key in route_counts.keys() - existing:
+        flight = route_flights[stats_key]
+        departure_airport = registry.get_airport(flight.departure_airport_id)
+        arrival_airport = registry.get_airport(flight.arrival_airport_id)
+
+        new_stats.append(AirportStats(
+            flight_id=stats_key,
+            departure_airport_name=departure_airport.airport_name,
+            arrival_airport_name=arrival_airport.airport_name,
+            departure_airport_id=flight.departure_airport_id,
+            arrival_airport_id=flight.arrival_airport_id,
+            distance_km=calculate_distance(departure_airport, arrival_airport),
+            flights_count=1,
+            passengers_count=route_counts[stats_key],
+            flight_time=flight.scheduled_arrival - flight.scheduled_departure,
+        ))
+    AirportStats.objects.bulk_create(new_stats)
+
+
+@receiver(post_save, sender=Airport)
+@receiver(post_delete, sender=Airport)
+def invalidate_airports(sender, **kwargs):
+    """
+    Signal receiver dropping the cached airports of the reference registry once the
+    change is committed, so that no reload can cache the state before it.
+    """
+    transaction.on_commit(registry.invalidate_airports, using=kwargs['using'])
+
+
+@receiver(post_save, sender=Aircraft)
+@receiver(post_delete, sender=Aircraft)
+def invalidate_aircraft(sender, **kwargs):
+    """
+    Signal receiver dropping the cached aircraft of the reference registry once the
+    change is committed.
+    """
+    transaction.on_commit(registry.invalidate_aircraft, using=kwargs['using'])
+
+
+@receiver(pre_save, sender=TicketFlight)
+@receiver(pre_save, sender=BoardingPass)
+def copy_flight_scheduled_departure(sender, instance, **kwargs):
+    """
+    Signal receiver copying the flight's scheduled departure onto ticket flights and
+    boarding passes, which are partitioned by it in the partitioned layout.
+    """
+    if instance.scheduled_departure is not None:
+        return
+
+    field = sender._meta.get_field('flight_id')
+    if field.is_cached(instance):
+        instance.scheduled_departure = instance.flight_id.scheduled_departure
+    else:
+        # Only the departure is needed, not the whole flight
+        instance.scheduled_departure = Flight.objects.filter(pk=instance.flight_id_id).values_list(
+            'scheduled_departure', flat=True,
+        ).first()
+
+
+def update_copied_departures(flight_ids):
+    """
+    Copy the flights' scheduled departure onto their ticket flights and boarding passes
+    where it differs. In the partitioned layout this moves the rows to the partition
+    of the new month.
+    """
+    with connection.cursor() as cursor:
+        for model in (TicketFlight, BoardingPass):
+            cursor.execute(
+                f'UPDATE "{model._meta.db_table}" t SET scheduled_departure = f.scheduled_departure '
+                f'FROM "{Flight._meta.db_table}" f '
+                f'WHERE t.flight_id = f.flight_id AND t.flight_id = ANY(%s) '
+                f'AND t.scheduled_departure IS DISTINCT FROM f.scheduled_departure',
+                [list(flight_ids)],
+            )
+
+
+@receiver(post_save, sender=Flight)
+def sync_copied_departures(sender, instance, created, **kwargs):
+    """
+    Signal receiver keeping the scheduled departure copied onto ticket flights and
+    boarding passes in sync when a flight is rescheduled.
+    """
+    update_fields = kwargs.get('update_fields')
+    loaded = instance.__dict__.get('_loaded_scheduled_departure', Flight.NOT_LOADED)
+    instance._loaded_scheduled_departure = instance.scheduled_departure
+
+    if created or (update_fields is not None and 'scheduled_departure' not in update_fields):
+        return
+    # Unchanged since the flight was loaded; instances not loaded from the database are synced
+    if loaded is not Flight.NOT_LOADED and loaded == instance.scheduled_departure:
+        return
+
+    update_copied_departures([instance.flight_id])
+
+
 @receiver(post_save, sender=TicketFlight)
 def update_flight_passenger_count(sender, instance, created, **kwargs):
     """
@@ -31,6 +188,9 @@ def update_flight_passenger_count(sender, instance, created, **kwargs):
     flight.passenger_count += 1
     flight.save(update_fields=['passenger_count'])
 
+    if not maintains_stats_table():
+        return
+
     # Update AirportStats passenger count
     stats_key = f"{flight.departure_airport_id}-{flight.arrival_airport_id}"
 
@@ -41,13 +201,16 @@ def update_flight_passenger_count(sender, instance, created, **kwargs):
             airport_stats.passengers_count += 1
             airport_stats.save(update_fields=['passengers_count'])
         except AirportStats.DoesNotExist:
+            departure_airport = registry.get_airport(flight.departure_airport_id)
+            arrival_airport = registry.get_airport(flight.arrival_airport_id)
+
             # Only calculate distance when creating a new record
-            distance_km = calculate_distance(flight.departure_airport, flight.arrival_airport)
+            distance_km = calculate_distance(departure_airport, arrival_airport)
 
             AirportStats.objects.create(
                 flight_id=stats_key,
-                departure_airport_name=flight.departure_airport.airport_name,
-                arrival_airport_name=flight.arrival_airport.airport_name,
+                departure_airport_name=departure_airport.airport_name,
+                arrival_airport_name=arrival_airport.airport_name,
                 departure_airport_id=flight.departure_airport_id,
                 arrival_airport_id=flight.arrival_airport_id,
                 distance_km=distance_km,
@@ -68,6 +231,9 @@ def decrement_flight_passenger_count(sender, instance, **kwargs):
         flight.passenger_count -= 1
         flight.save(update_fields=['passenger_count'])
 
+        if not maintains_stats_table():
+            return
+
         # Update AirportStats passenger count
         stats_key = f"{flight.departure_airport_id}-{flight.arrival_airport_id}"
 
@@ -86,6 +252,14 @@ def update_airport_stats_for_flight(sender, instance, created, **kwargs):
     Signal receiver to update AirportStats when a Flight is created or updated.
     Updates flight count and average flight time.
     """
+    if not maintains_stats_table():
+        return
+
+    # Saves of fields the statistics do not depend on, e.g. status updates, need no lookup
+    update_fields = kwargs.get('update_fields')
+    if not created and update_fields is not None and not update_fields & FLIGHT_STATS_FIELDS:
+        return
+
     if not instance.scheduled_departure or not instance.scheduled_arrival:
         return  # Skip update if flight schedule is missing
 
@@ -109,13 +283,16 @@ def update_airport_stats_for_flight(sender, instance, created, **kwargs):
 
             airport_stats.save(update_fields=['flights_count', 'passengers_count', 'flight_time'])
     except AirportStats.DoesNotExist:
+        departure_airport = registry.get_airport(instance.departure_airport_id)
+        arrival_airport = registry.get_airport(instance.arrival_airport_id)
+
         # Only calculate distance when creating a new AirportStats record
-        distance_km = calculate_distance(instance.departure_airport, instance.arrival_airport)
+        distance_km = calculate_distance(departure_airport, arrival_airport)
 
         AirportStats.objects.create(
             flight_id=stats_key,
-            departure_airport_name=instance.departure_airport.airport_name,
-            arrival_airport_name=instance.arrival_airport.airport_name,
+            departure_airport_name=departure_airport.airport_name,
+            arrival_airport_name=arrival_airport.airport_name,
             departure_airport_id=instance.departure_airport_id,
             arrival_airport_id=instance.arrival_airport_id,
             distance_km=distance_km,
@@ -131,6 +308,9 @@ def decrement_airport_stats_for_flight(sender, instance, **kwargs):
     Signal receiver to update AirportStats when a Flight is deleted.
     Decrements flight count and updates average flight time.
     """
+    if not maintains_stats_table():
+        return
+
     stats_key = f"{instance.departure_airport_id}-{instance.arrival_airport_id}"
 
     airport_stats = AirportStats.objects.filter(
@@ -1,8 +1,25 @@
 from django.urls import path, include
 
-from api.v1.views import AirportListAPIView, AirportStatisticsAPIView
+from api.v1 import async_views
+from api.v1.views import (
+    AirportAutocompleteAPIView, AirportListAPIView, AirportNetworkStatsAPIView, AirportStatisticsAPIView,
+    AirportStatisticsExportAPIView, BookingCreateAPIView, FlightBoardAPIView, FlightStatusFeedAPIView,
+    PassengerSearchAPIView,
+)
 
 urlpatterns = [
     path('airports/', AirportListAPIView.as_view(), name='airport-list'),
+    path('airports/autocomplete/', AirportAutocompleteAPIView.as_view(), name='airport-autocomplete'),
+    path('airports/<str:airport_code>/departures/', FlightBoardAPIView.as_view(direction='departures'),
+         name='airport-departures'),
+    path('airports/<str:airport_code>/arrivals/', FlightBoardAPIView.as_view(direction='arrivals'),
+         name='airport-arrivals'),
     path('airport-statistics/', AirportStatisticsAPIView.as_view(), name='airport-stats'),
+    path('airport-statistics/export/', AirportStatisticsExportAPIView.as_view(), name='airport-stats-export'),
+    path('airport-network/', AirportNetworkStatsAPIView.as_view(), name='airport-network'),
+    path('bookings/', BookingCreateAPIView.as_view(), name='booking-create'),
+    path('flights/status/', FlightStatusFeedAPIView.as_view(), name='flight-status-feed'),
+    path('passengers/search/', PassengerSearchAPIView.as_view(), name='passenger-search'),
+    path('async/airports/', async_views.airport_list, name='async-airport-list'),
+    path('async/airport-statistics/', async_views.airport_statistics, name='async-airport-stats'),
 ]
\ No newline at end of file
@@ -1,21 +1,126 @@
+import csv
+import datetime
+import io
+import json
+import zlib
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 
+from django.contrib.postgres.search import TrigramSimilarity
 from django.db import models
-from django.db.models import F
+from django.http import StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from django.db.models import F, Prefetch, Q
 from django.db.models.fields.json import KeyTextTransform
 from django.db.models.functions import Cast, Concat
 from django.utils.translation import get_language
 from django_filters.rest_framework import DjangoFilterBackend
 
 from rest_framework import permissions, generics
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import CursorPagination, PageNumberPagination
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
 
+from app.autocomplete import get_airport_index
 from app.filters import AirportStatsFilter
-from app.models import Airport, Flight, AirportStats
-from .serializers import AirportSerializer, AirportStatsResponseSerializer
+from app.models import Airport, AirportNetworkStats, Flight, AirportStats, Ticket, TicketFlight, normalized_passenger_id
+from app.registry import registry
+from app.routers import read_from_replica
+from app.status_feed import MAX_BATCH_SIZE, apply_status_updates, clean_update
+from .encoders import get_row_encoder
+from .renderers import CSVRenderer, MessagePackRenderer, NDJSONRenderer
+from .serializers import (
+    AirportNetworkStatsSerializer, AirportSerializer, AirportStatsResponseSerializer, BookingCreateSerializer,
+    FlightBoardSerializer, PassengerSearchSerializer,
+)
 
 
-class AirportListAPIView(generics.ListAPIView):
+def get_request_language():
+    """ Return the active language without the region part, e.g. 'en' for 'en-us'. """
+    lang = get_language()
+
+    if '-' in lang:
+        lang = lang.split('-')[0]
+
+    return lang
+
+
+def get_airports_queryset(lang):
+    """ Airports annotated with the names translated to `lang`. """
+
+    # Annotate the queryset with the translated airport name
+    airports = Airport.objects.all().annotate(
+        airport_name_translated=KeyTextTransform(lang, F('airport_name')),
+        city_translated=KeyTextTransform(lang, F('city')),
+    ).order_by('airport_name')
+
+    return airports
+
+
+def get_airport_stats_queryset(lang, data):
+    """ Airport statistics translated to `lang` and sorted by the `sort_field`/`sort_order` params in `data`. """
+
+    sort_field = None
+    sort_order = None
+
+    if data.get('sort_field') != "":
+        sort_field = data.get('sort_field')
+        sort_order = data.get('sort_order', 'asc')
+
+    airport_stats = AirportStats.objects.all().annotate(
+
+        # Airport translated name
+        departure_airport_translated=Cast(
+            KeyTextTransform(lang, F('departure_airport_name')), output_field=models.TextField()
+        ),
+        arrival_airport_translated=Cast(
+            KeyTextTransform(lang, F('arrival_airport_name')), output_field=models.TextField()
+        ),
+    )
+
+    # If sort_field is not None, sort the queryset
+    if sort_field:
+        if sort_order == 'desc':
+            sort_field = f'-{sort_field}'
+        airport_stats = airport_stats.order_by(sort_field)
+
+    return airport_stats
+
+
+class ReplicaReadMixin:
+    """
+    View mixin letting the request's reads of the statistics models (see
+    app.routers.REPLICA_MODELS) be served by a read replica.
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        with read_from_replica():
+            return super().dispatch(request, *args, **kwargs)
+
+
+class EncodedListMixin:
+    """
+    List mixin for read-only endpoints that encodes rows with the compiled
+    RowEncoder of the view's serializer instead of instantiating it per row.
+    The output is the same as the one of `ListModelMixin.list`.
+    """
+
+    def get_row_encoder(self):
+        return get_row_encoder(self.get_serializer_class())
+
+    def list(self, request, *args, **kwargs):
+        encoder = self.get_row_encoder()
+        queryset = self.filter_queryset(self.get_queryset()).values_list(*encoder.sources)
+
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(encoder.encode(page))
+
+        return Response(encoder.encode(queryset))
+
+
+class AirportListAPIView(ReplicaReadMixin, EncodedListMixin, generics.ListAPIView):
     """
     API endpoint that allows airports to be viewed.
     """
@@ -23,18 +128,7 @@ class AirportListAPIView(generics.ListAPIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
-        lang = get_language()
-
-        if '-' in lang:
-            lang = lang.split('-')[0]
-
-        # Annotate the queryset with the translated airport name
-        airports = Airport.objects.all().annotate(
-            airport_name_translated=KeyTextTransform(lang, F('airport_name')),
-            city_translated=KeyTextTransform(lang, F('city')),
-        ).order_by('airport_name')
-
-        return airports
+        return get_airports_queryset(get_request_language())
 
 class CustomPagination(PageNumberPagination):
     page_size = 10
@@ -48,49 +142,389 @@ class CustomPagination(PageNumberPagination):
             'results': data
         })
 
-class AirportStatisticsAPIView(generics.ListAPIView):
+class AirportStatisticsAPIView(ReplicaReadMixin, EncodedListMixin, generics.ListAPIView):
     """
     API endpoint that allows airport statistics to be viewed.
+
+    Besides the default JSON, the response can be requested as MessagePack
+    (`Accept: application/msgpack` or `?format=msgpack`) and in a columnar
+    layout (`?layout=columnar`) with one array per field. Both bypass the
+    serializer and build the response from `values_list()` tuples; in these
+    formats `flight_time` is given in seconds.
     """
     serializer_class = AirportStatsResponseSerializer
     permission_classes = [permissions.IsAuthenticated]
     filter_backends = [DjangoFilterBackend]
     filterset_class = AirportStatsFilter
     pagination_class = CustomPagination
+    renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES + [MessagePackRenderer]
+
+    def use_fast_path(self):
+        return (
+            self.request.accepted_renderer.format == MessagePackRenderer.format
+            or self.request.query_params.get('layout') == 'columnar'
+        )
+
+    def list(self, request, *args, **kwargs):
+        if not self.use_fast_path():
+            return super().list(request, *args, **kwargs)
+
+        encoder = self.get_row_encoder()
+        names = encoder.names
+        queryset = self.filter_queryset(self.get_queryset()).values_list(*encoder.sources)
+
+        page = self.paginate_queryset(queryset)
+        rows = page if page is not None else queryset
+
+        # Send flight_time as seconds instead of a formatted duration string
+        i = names.index('flight_time')
+        rows = [
+            row[:i] + (None if row[i] is None else row[i].total_seconds(),) + row[i + 1:]
+            for row in rows
+        ]
+
+        if request.query_params.get('layout') == 'columnar':
+            columns = list(zip(*rows)) or [()] * len(names)
+            data = {name: list(values) for name, values in zip(names, columns)}
+        else:
+            data = [dict(zip(names, row)) for row in rows]
+
+        if page is not None:
+            return self.get_paginated_response(data)
+        return Response(data)
 
     def get_queryset(self):
+        return get_airport_stats_queryset(get_request_language(), self.request.query_params)
+
+class AirportStatisticsExportAPIView(AirportStatisticsAPIView):
+    """
+    API endpoint that streams the whole filtered and sorted airport statistics
+    as CSV (`?export_format=csv`, default) or NDJSON (`?export_format=ndjson`).
+    Without `export_format`, `Accept: text/csv` or `Accept: application/x-ndjson`
+    (or `?format=`) selects the format.
+
+    Rows are read through a server-side cursor and written in batches, so memory
+    stays constant regardless of the table size. The stream is gzip-compressed
+    on the fly when the client accepts it.
+    """
+    pagination_class = None
+    renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES + [CSVRenderer, NDJSONRenderer]
+    chunk_size = 2000
+
+    export_formats = {
+        'csv': ('text/csv', 'csv'),
+        'ndjson': ('application/x-ndjson', 'ndjson'),
+    }
+
+    def iter_csv(self, encoder, rows):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(encoder.names)
+
+        for i, row in enumerate(rows, 1):
+            writer.writerow(encoder.encode_row(row).values())
+            if i % self.chunk_size == 0:
+                yield buffer.getvalue().encode()
+                buffer.seek(0)
+                buffer.truncate()
 
-        request = self.request
-        data = request.query_params
+        yield buffer.getvalue().encode()
 
-        sort_field = None
-        sort_order = None
+    def iter_ndjson(self, encoder, rows):
+        lines = []
 
-        if data.get('sort_field') != "":
-            sort_field = data.get('sort_field')
-            sort_order = data.get('sort_order', 'asc')
+        for row in rows:
+            lines.append(json.dumps(encoder.encode_row(row), ensure_ascii=False))
+            if len(lines) == self.chunk_size:
+                yield ('\n'.join(lines) + '\n').encode()
+                lines = []
 
-        # Language extraction from request headers (default to 'en' if not found)
-        lang = get_language()
+        if lines:
+            yield ('\n'.join(lines) + '\n').encode()
 
-        if '-' in lang:
-            lang = lang.split('-')[0]
+    def gzip_stream(self, chunks):
+        compressor = zlib.compressobj(wbits=31)  # 31 -> gzip container
+        for chunk in chunks:
+            data = compressor.compress(chunk)
+            if data:
+                yield data
+        yield compressor.flush()
 
-        airport_stats = AirportStats.objects.all().annotate(
+    def get(self, request, *args, **kwargs):
+        accepted_format = request.accepted_renderer.format
+        default_format = accepted_format if accepted_format in self.export_formats else 'csv'
+        export_format = request.query_params.get('export_format', default_format)
+        if export_format not in self.export_formats:
+            raise ValidationError({'export_format': f"Must be one of: {', '.join(self.export_formats)}."})
+        content_type, extension = self.export_formats[export_format]
 
-            # Airport translated name
-            departure_airport_translated=Cast(
-                KeyTextTransform(lang, F('departure_airport_name')), output_field=models.TextField()
-            ),
-            arrival_airport_translated=Cast(
-                KeyTextTransform(lang, F('arrival_airport_name')), output_field=models.TextField()
-            ),
+        encoder = self.get_row_encoder()
+        queryset = self.filter_queryset(self.get_queryset()).values_list(*encoder.sources)
+
+        # The stream is consumed after dispatch() returns, so bind the database chosen now
+        rows = queryset.using(queryset.db).iterator(chunk_size=self.chunk_size)
+
+        if export_format == 'csv':
+            stream = self.iter_csv(encoder, rows)
+        else:
+            stream = self.iter_ndjson(encoder, rows)
+
+        gzipped = 'gzip' in request.headers.get('Accept-Encoding', '')
+        if gzipped:
+            stream = self.gzip_stream(stream)
+
+        response = StreamingHttpResponse(stream, content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="airport-statistics.{extension}"'
+        response['Vary'] = 'Accept-Encoding'
+        if gzipped:
+            response['Content-Encoding'] = 'gzip'
+        return response
+
+
+class PassengerSearchAPIView(generics.ListAPIView):
+    """
+    API endpoint that finds tickets by passenger.
+
+    `q` is matched according to `by`:
+      - name (default): prefix match or trigram similarity on the passenger name
+      - document: exact match on the passenger document number, ignoring case and spaces
+      - email, phone: exact match inside the ticket contact data
+
+    Every lookup is backed by an index on Ticket. At most `limit` tickets are
+    returned with their booking and flights, in two queries: the search, which
+    joins the booking, and the prefetch of the ticket flights with their flights.
+    """
+    serializer_class = PassengerSearchSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    search_types = ('name', 'document', 'email', 'phone')
+    default_limit = 20
+    max_limit = 50
+
+    def get_limit(self):
+        try:
+            limit = int(self.request.query_params.get('limit', self.default_limit))
+        except ValueError:
+            raise ValidationError({'limit': 'A valid integer is required.'})
+        return max(1, min(limit, self.max_limit))
+
+    def get_queryset(self):
+        data = self.request.query_params
+        q = data.get('q', '').strip()
+        by = data.get('by', 'name')
+
+        if by not in self.search_types:
+            raise ValidationError({'by': f"Must be one of: {', '.join(self.search_types)}."})
+
+        tickets = Ticket.objects.select_related('book_ref').prefetch_related(
+            Prefetch(
+                'ticketflight_set',
+                queryset=TicketFlight.objects.select_related('flight_id').order_by('flight_id__scheduled_departure'),
+            )
         )
 
-        # If sort_field is not None, sort the queryset
-        if sort_field:
-            if sort_order == 'desc':
-                sort_field = f'-{sort_field}'
-            airport_stats = airport_stats.order_by(sort_field)
+        if not q:
+            return tickets.none()
+
+        if by == 'name':
+            # Passenger names are stored upper-cased; a plain LIKE prefix can use the trigram index
+            name = q.upper()
+            tickets = tickets.annotate(
+                similarity=TrigramSimilarity('passenger_name', name),
+            ).filter(
+                Q(passenger_name__startswith=name) | Q(passenger_name__trigram_similar=name)
+            ).order_by('-similarity', 'ticket_no')
+        elif by == 'document':
+            tickets = tickets.alias(
+                passenger_id_normalized=normalized_passenger_id(),
+            ).filter(
+                passenger_id_normalized=q.upper().replace(' ', ''),
+            ).order_by('ticket_no')
+        else:
+            tickets = tickets.filter(contact_data__contains={by: q}).order_by('ticket_no')
+
+        return tickets[:self.get_limit()]
+
+
+class BookingCreateAPIView(generics.CreateAPIView):
+    """
+    API endpoint that creates a booking with its tickets and flight legs in one request.
+
+    The flights' passenger counts and route statistics are updated once per flight
+    and route, instead of once per ticket flight by the signal receivers.
+    """
+    serializer_class = BookingCreateSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+
+class FlightStatusFeedAPIView(generics.GenericAPIView):
+    """
+    API endpoint applying a batch of flight status updates.
+
+    Takes a list of `{"flight_id": ..., "status": ..., "actual_departure": ..., ...}`
+    objects, which may also move a flight's schedule or airports. The whole batch is
+    applied with one bulk UPDATE; route statistics only change for updates that
+    touch the route or the schedule. Returns counts of what was applied.
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def post(self, request, *args, **kwargs):
+        if not isinstance(request.data, list):
+            raise ValidationError({'non_field_errors': ['Expected a list of updates.']})
+        if len(request.data) > MAX_BATCH_SIZE:
+            raise ValidationError({'non_field_errors': [f"At most {MAX_BATCH_SIZE} updates per request."]})
+
+        updates = []
+        errors = {}
+        for i, record in enumerate(request.data):
+            try:
+                updates.append(clean_update(record))
+            except ValueError as e:
+                errors[i] = [str(e)]
+        if errors:
+            raise ValidationError(errors)
+
+        return Response(apply_status_updates(updates))
+
+
+class BoardPagination(CursorPagination):
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+    def get_ordering(self, request, queryset, view):
+        return view.get_board_ordering()
+
+
+class FlightBoardAPIView(generics.ListAPIView):
+    """
+    API endpoint with the departures or arrivals board of an airport.
+
+    `date` (YYYY-MM-DD, default today) and the `from`/`to` times (HH:MM, `to`
+    exclusive, default the whole day) are in the airport's local time, and so
+    are the times in the response. Results are keyset-paginated through the
+    `next`/`previous` cursor links and served by the flight board indexes.
+    """
+    serializer_class = FlightBoardSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = BoardPagination
+
+    # 'departures' or 'arrivals', passed to as_view()
+    direction = None
+
+    # Direction -> (airport field, scheduled time field)
+    board_fields = {
+        'departures': ('departure_airport', 'scheduled_departure'),
+        'arrivals': ('arrival_airport', 'scheduled_arrival'),
+    }
+
+    def get_board_ordering(self):
+        return self.board_fields[self.direction][1], 'flight_id'
+
+    def get_airport_timezone(self):
+        if not hasattr(self, '_airport_timezone'):
+            airport = get_object_or_404(Airport.objects.only('timezone'), airport_code=self.kwargs['airport_code'].upper())
+            try:
+                self._airport_timezone = ZoneInfo(airport.timezone)
+            except (ValueError, ZoneInfoNotFoundError):
+                self._airport_timezone = datetime.timezone.utc
+        return self._airport_timezone
+
+    def get_time_range(self, tz):
+        data = self.request.query_params
+
+        try:
+            if data.get('date'):
+                day = datetime.date.fromisoformat(data['date'])
+            else:
+                day = timezone.now().astimezone(tz).date()
+            start = datetime.time.fromisoformat(data.get('from') or '00:00')
+            end = datetime.time.fromisoformat(data['to']) if data.get('to') else None
+        except ValueError:
+            raise ValidationError({'detail': 'Use YYYY-MM-DD for date and HH:MM for from/to.'})
+
+        start_at = datetime.datetime.combine(day, start, tzinfo=tz)
+        if end is None:
+            end_at = datetime.datetime.combine(day + datetime.timedelta(days=1), datetime.time(), tzinfo=tz)
+        else:
+            end_at = datetime.datetime.combine(day, end, tzinfo=tz)
+
+        return start_at, end_at
+
+    def get_queryset(self):
+        airport_field, time_field = self.board_fields[self.direction]
+        start_at, end_at = self.get_time_range(self.get_airport_timezone())
+
+        return Flight.objects.filter(**{
+            airport_field: self.kwargs['airport_code'].upper(),
+            f'{time_field}__gte': start_at,
+            f'{time_field}__lt': end_at,
+        })
+
+    def list(self, request, *args, **kwargs):
+        # Times are rendered in the current time zone, i.e. the airport's local time
+        with timezone.override(self.get_airport_timezone()):
+            return super().list(request, *args, **kwargs)
+
+
+class AirportAutocompleteAPIView(generics.GenericAPIView):
+    """
+    API endpoint suggesting airports for the `q` prefix.
+
+    Matches airport codes, and airport and city names in every language, ignoring
+    case and accents and across Cyrillic/Latin transliteration. Answered from the
+    in-memory prefix index, without database queries once the index is built.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    default_limit = 10
+    max_limit = 50
+
+    def get(self, request, *args, **kwargs):
+        q = request.query_params.get('q', '')
+        try:
+            limit = max(1, min(int(request.query_params.get('limit', self.default_limit)), self.max_limit))
+        except ValueError:
+            raise ValidationError({'limit': 'A valid integer is required.'})
+
+        if not q.strip():
+            return Response([])
+
+        lang = get_request_language()
+        results = []
+
+        for code in get_airport_index().search(q, limit):
+            airport = registry.get_airport(code)
+            results.append({
+                'airport_code': code,
+                'airport_name': airport.name(lang),
+                'city': airport.city_name(lang),
+            })
+
+        return Response(results)
+
+
+class AirportNetworkStatsAPIView(ReplicaReadMixin, EncodedListMixin, generics.ListAPIView):
+    """
+    API endpoint with the route network metrics of airports, sortable with
+    `sort_field`/`sort_order` like the airport statistics.
+    """
+    serializer_class = AirportNetworkStatsSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = CustomPagination
+
+    sort_fields = ('airport_id', 'out_degree', 'in_degree', 'flights_count', 'passengers_count',
+                   'transfer_pairs', 'two_hop_reach')
+
+    def get_queryset(self):
+        data = self.request.query_params
+        lang = get_request_language()
+
+        sort_field = data.get('sort_field') or 'passengers_count'
+        if sort_field not in self.sort_fields:
+            raise ValidationError({'sort_field': f"Must be one of: {', '.join(self.sort_fields)}."})
+        if data.get('sort_order', 'desc') == 'desc':
+            sort_field = f'-{sort_field}'
 
-        return airport_stats
\ No newline at end of file
+        return AirportNetworkStats.objects.annotate(
+            airport_name_translated=KeyTextTransform(lang, F('airport__airport_name')),
+        ).order_by(sort_field, 'airport_id')
@@ -1,13 +1,150 @@
+import json
+
 from django.contrib import admin
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.contrib.admin.views.main import ChangeList, ORDER_VAR, PAGE_VAR
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db.models import Q
+from django.utils.functional import cached_property
 
 from app.models import Aircraft, Airport, Flight, BoardingPass, Booking, Seat, Ticket, TicketFlight
 
+# Query parameter holding the primary key the next keyset page starts after
+KEYSET_VAR = 'after'
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator that takes the row count from the query planner instead of an
+    exact COUNT(*) when the planner expects a large result.
+    """
+    exact_count_threshold = 10000
+
+    @cached_property
+    def count(self):
+        plan = json.loads(self.object_list.explain(format='json'))
+        estimate = int(plan[0]['Plan']['Plan Rows'])
+
+        if estimate < self.exact_count_threshold:
+            return super().count
+        return estimate
+
+
+class KeysetChangeList(ChangeList):
+    """
+    ChangeList that can page by primary key (`?after=<pk>`) instead of OFFSET,
+    so pages deep into a large table cost the same as the first one. Keyset
+    paging applies only while the list is in its default primary key order.
+    """
+
+    def get_filters_params(self, params=None):
+        lookup_params = super().get_filters_params(params)
+        lookup_params.pop(KEYSET_VAR, None)
+        return lookup_params
+
+    def get_queryset(self, request, exclude_parameters=None):
+        qs = super().get_queryset(request, exclude_parameters)
+
+        after = request.GET.get(KEYSET_VAR)
+        if after is not None and ORDER_VAR not in self.params:
+            try:
+                qs = qs.filter(pk__gt=after)
+            except (ValueError, ValidationError) as e:
+                raise IncorrectLookupParameters(e)
+
+        return qs
+
+    def get_results(self, request):
+        super().get_results(request)
+
+        self.keyset_next_url = None
+        if ORDER_VAR not in self.params and self.multi_page:
+            results = list(self.result_list)
+            if results:
+                self.keyset_next_url = self.get_query_string(
+                    {KEYSET_VAR: results[-1].pk}, remove=[PAGE_VAR]
+                )
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """
+    Base admin for tables with millions of rows: planner-estimated counts,
+    keyset paging, raw-id widgets and exact-match search on indexed columns.
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    change_list_template = 'admin/keyset_change_list.html'
+    ordering = ('pk',)
+    list_per_page = 50
+
+    # Columns searched with an exact match, so the lookup can use their index
+    exact_search_fields = ()
+
+    def get_search_fields(self, request):
+        return self.exact_search_fields
+
+    def get_changelist(self, request, **kwargs):
+        return KeysetChangeList
+
+    def get_search_results(self, request, queryset, search_term):
+        search_term = search_term.strip()
+        if not search_term:
+            return queryset, False
+
+        query = None
+        for field in self.exact_search_fields:
+            try:
+                # Skip fields the term is not a valid value for, e.g. text in an integer column
+                queryset.filter(**{field: search_term})
+            except (ValueError, ValidationError):
+                continue
+            query = Q(**{field: search_term}) if query is None else query | Q(**{field: search_term})
+
+        if query is None:
+            return queryset.none(), False
+        return queryset.filter(query), False
+
+
+@admin.register(Flight)
+class FlightAdmin(LargeTableAdmin):
+    list_display = ('flight_id', 'flight_no', 'departure_airport', 'arrival_airport',
+                    'scheduled_departure', 'status', 'passenger_count')
+    list_select_related = ('departure_airport', 'arrival_airport')
+    raw_id_fields = ('departure_airport', 'arrival_airport', 'aircraft_code')
+    exact_search_fields = ('flight_id', 'flight_no')
+
+
+@admin.register(Booking)
+class BookingAdmin(LargeTableAdmin):
+    list_display = ('book_ref', 'book_date', 'total_amount')
+    exact_search_fields = ('book_ref',)
+
+
+@admin.register(Ticket)
+class TicketAdmin(LargeTableAdmin):
+    list_display = ('ticket_no', 'book_ref', 'passenger_id', 'passenger_name')
+    list_select_related = ('book_ref',)
+    raw_id_fields = ('book_ref',)
+    exact_search_fields = ('ticket_no', 'book_ref')
+
+
+@admin.register(TicketFlight)
+class TicketFlightAdmin(LargeTableAdmin):
+    list_display = ('id', 'ticket_no', 'flight_id', 'fare_condition', 'amount')
+    list_select_related = ('ticket_no', 'flight_id__departure_airport', 'flight_id__arrival_airport')
+    raw_id_fields = ('ticket_no', 'flight_id')
+    exact_search_fields = ('ticket_no', 'flight_id')
+
+
+@admin.register(BoardingPass)
+class BoardingPassAdmin(LargeTableAdmin):
+    list_display = ('id', 'ticket_no', 'flight_id', 'boarding_no', 'seat_no')
+    list_select_related = ('ticket_no', 'flight_id__departure_airport', 'flight_id__arrival_airport')
+    raw_id_fields = ('ticket_no', 'flight_id')
+    exact_search_fields = ('ticket_no', 'flight_id')
+
+
 admin.site.register(Aircraft)
 admin.site.register(Airport)
-admin.site.register(Flight)
-admin.site.register(BoardingPass)
-admin.site.register(Booking)
 admin.site.register(Seat)
-admin.site.register(Ticket)
-admin.site.register(TicketFlight)
-
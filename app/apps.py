@@ -1,4 +1,13 @@
 from django.apps import AppConfig
+from django.db.models.signals import pre_migrate
+
+
+def create_postgres_extensions(sender, using, **kwargs):
+    """ Create the extensions the app's indexes rely on before its migrations run. """
+    from django.db import connections
+
+    with connections[using].cursor() as cursor:
+        cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
 
 
 class AppConfig(AppConfig):
@@ -6,4 +15,6 @@ class AppConfig(AppConfig):
     name = 'app'
 
     def ready(self):
-        import api.v1.signals
\ No newline at end of file
+        import api.v1.signals
+
+        pre_migrate.connect(create_postgres_extensions, sender=self)
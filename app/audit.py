@@ -0,0 +1,128 @@
+"""
+Data-integrity checks run by the audit_data command.
+
+Every check is one set-based query (anti-join or grouped sum) restricted to a
+range of its key, so a full audit can be split into key ranges and run by
+several worker processes, each with its own database connection.
+"""
+import re
+import time
+
+from django.db import connection
+
+from app.models import BoardingPass, Booking, Flight, Ticket, TicketFlight
+
+MODELS = {model.__name__: model for model in (BoardingPass, Booking, Flight, Ticket, TicketFlight)}
+
+# Check name -> (key model, description, SQL). In the SQL, {Model} is the model's table and
+# {range:alias.column} restricts the column to the key range of the run.
+CHECKS = {
+    'booking_total': (Booking, 'Booking total_amount differs from the sum of its ticket flight amounts', """
+        SELECT b.book_ref, b.total_amount, COALESCE(s.amount, 0) AS ticket_flights_amount
+        FROM "{Booking}" b
+        LEFT JOIN (
+            SELECT t.book_ref_id, sum(tf.amount) AS amount
+            FROM "{Ticket}" t
+            JOIN "{TicketFlight}" tf ON tf.ticket_no = t.ticket_no
+            WHERE {range:t.book_ref_id}
+            GROUP BY t.book_ref_id
+        ) s ON s.book_ref_id = b.book_ref
+        WHERE {range:b.book_ref} AND b.total_amount <> COALESCE(s.amount, 0)
+    """),
+    'booking_without_tickets': (Booking, 'Booking has no tickets', """
+        SELECT b.book_ref
+        FROM "{Booking}" b
+        WHERE {range:b.book_ref}
+          AND NOT EXISTS (SELECT 1 FROM "{Ticket}" t WHERE t.book_ref_id = b.book_ref)
+    """),
+    'ticket_without_flights': (Ticket, 'Ticket has no ticket flights', """
+        SELECT t.ticket_no, t.book_ref_id AS book_ref
+        FROM "{Ticket}" t
+        WHERE {range:t.ticket_no}
+          AND NOT EXISTS (SELECT 1 FROM "{TicketFlight}" tf WHERE tf.ticket_no = t.ticket_no)
+    """),
+    'duplicate_ticket_flight': (Ticket, 'Ticket has the same flight more than once', """
+        SELECT tf.ticket_no, tf.flight_id, count(*) AS copies
+        FROM "{TicketFlight}" tf
+        WHERE {range:tf.ticket_no}
+        GROUP BY tf.ticket_no, tf.flight_id
+        HAVING count(*) > 1
+    """),
+    'boarding_pass_without_ticket_flight': (Ticket, 'Boarding pass has no matching ticket flight', """
+        SELECT bp.id AS boarding_pass_id, bp.ticket_no, bp.flight_id, bp.seat_no
+        FROM "{BoardingPass}" bp
+        WHERE {range:bp.ticket_no}
+          AND NOT EXISTS (
+              SELECT 1 FROM "{TicketFlight}" tf WHERE tf.ticket_no = bp.ticket_no AND tf.flight_id = bp.flight_id
+          )
+    """),
+    'flight_passenger_count': (Flight, 'Flight passenger_count differs from its number of ticket flights', """
+        SELECT f.flight_id, f.passenger_count, COALESCE(c.ticket_flights, 0) AS ticket_flights
+        FROM "{Flight}" f
+        LEFT JOIN (
+            SELECT tf.flight_id, count(*) AS ticket_flights
+            FROM "{TicketFlight}" tf
+            WHERE {range:tf.flight_id}
+            GROUP BY tf.flight_id
+        ) c ON c.flight_id = f.flight_id
+        WHERE {range:f.flight_id} AND f.passenger_count <> COALESCE(c.ticket_flights, 0)
+    """),
+    'ticket_flight_departure_copy': (Flight, "Ticket flight scheduled_departure differs from its flight's", """
+        SELECT tf.id AS ticket_flight_id, tf.ticket_no, tf.flight_id,
+               tf.scheduled_departure, f.scheduled_departure AS flight_scheduled_departure
+        FROM "{TicketFlight}" tf
+        JOIN "{Flight}" f ON f.flight_id = tf.flight_id
+        WHERE {range:tf.flight_id} AND tf.scheduled_departure IS DISTINCT FROM f.scheduled_departure
+    """),
+    'boarding_pass_departure_copy': (Flight, "Boarding pass scheduled_departure differs from its flight's", """
+        SELECT bp.id AS boarding_pass_id, bp.ticket_no, bp.flight_id,
+               bp.scheduled_departure, f.scheduled_departure AS flight_scheduled_departure
+        FROM "{BoardingPass}" bp
+        JOIN "{Flight}" f ON f.flight_id = bp.flight_id
+        WHERE {range:bp.flight_id} AND bp.scheduled_departure IS DISTINCT FROM f.scheduled_departure
+    """),
+}
+
+
+def key_range(column, low, high):
+    """ SQL condition for low <= column < high, either bound being optional. """
+    conditions = []
+    if low is not None:
+        conditions.append(f"{column} >= %(low)s")
+    if high is not None:
+        conditions.append(f"{column} < %(high)s")
+    return ' AND '.join(conditions) or 'TRUE'
+
+
+def render_sql(template, low, high):
+    sql = re.sub(r'\{range:([\w.]+)\}', lambda match: key_range(match.group(1), low, high), template)
+    return re.sub(r'\{(\w+)\}', lambda match: MODELS[match.group(1)]._meta.db_table, sql)
+
+
+def get_key_ranges(model, partitions):
+    """ Split the primary keys of `model` into about `partitions` ranges of similar size. """
+    if partitions <= 1:
+        return [(None, None)]
+
+    table = model._meta.db_table
+    column = model._meta.pk.column
+    fractions = [i / partitions for i in range(1, partitions)]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT percentile_disc(%s::double precision[]) WITHIN GROUP (ORDER BY "{column}") FROM "{table}"',
+            [fractions],
+        )
+        bounds = cursor.fetchone()[0] or []
+
+    bounds = sorted(set(bound for bound in bounds if bound is not None))
+    return list(zip([None, *bounds], [*bounds, None]))
+
+
+def run_check(name, low, high):
+    """ Run one check over one key range. Returns (name, discrepancies as dicts, seconds). """
+    start = time.perf_counter()
+    with connection.cursor() as cursor:
+        cursor.execute(render_sql(CHECKS[name][2], low, high), {'low': low, 'high': high})
+        columns = [column[0] for column in cursor.description]
+        rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
+    return name, rows, time.perf_counter() - start
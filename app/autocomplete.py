@@ -0,0 +1,105 @@
+"""
+In-memory prefix index for airport autocomplete.
+
+Every airport is indexed under its code and under the airport and city names
+in all languages, whole and word by word. Keys are case- and accent-folded and
+Cyrillic is also indexed transliterated to Latin, so "moskva", "Москва" and
+"МОСКВА" all find Moscow. The index is a sorted key array searched with
+bisect, built from the reference registry and rebuilt when it changes.
+"""
+import bisect
+import re
+import threading
+import unicodedata
+
+from app.registry import registry
+
+CYRILLIC_TO_LATIN = {
+    'а': 'a', 'б': 'b', 'в': 'v', 'г': 'g', 'д': 'd', 'е': 'e', 'ё': 'e', 'ж': 'zh', 'з': 'z',
+    'и': 'i', 'й': 'y', 'к': 'k', 'л': 'l', 'м': 'm', 'н': 'n', 'о': 'o', 'п': 'p', 'р': 'r',
+    'с': 's', 'т': 't', 'у': 'u', 'ф': 'f', 'х': 'kh', 'ц': 'ts', 'ч': 'ch', 'ш': 'sh', 'щ': 'shch',
+    'ъ': '', 'ы': 'y', 'ь': '', 'э': 'e', 'ю': 'yu', 'я': 'ya',
+}
+TRANSLITERATION = str.maketrans(CYRILLIC_TO_LATIN)
+
+WORD_SEPARATORS = re.compile(r"[\s\-'’().,/]+")
+
+# Match kinds, best first
+CODE, NAME, CITY, NAME_WORD, CITY_WORD = range(5)
+
+
+def fold(text):
+    """ Lower-case `text` and strip accents ("München" -> "munchen"), keeping Cyrillic letters. """
+    decomposed = unicodedata.normalize('NFKD', text.casefold())
+    # й and ё decompose into base letter + mark as well; recompose them before dropping marks
+    decomposed = decomposed.replace('\u0438\u0306', '\u0439').replace('\u0435\u0308', '\u0451')
+    return ''.join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def variants(text):
+    """ The folded text and, if different, its Latin transliteration. """
+    folded = fold(text)
+    latin = folded.translate(TRANSLITERATION)
+    return {folded, latin}
+
+
+class AirportPrefixIndex:
+
+    def __init__(self, airports):
+        entries = set()
+
+        for code, airport in airports.items():
+            entries.add((code.casefold(), CODE, code))
+
+            for names, kind, word_kind in (
+                    (airport.airport_name, NAME, NAME_WORD),
+                    (airport.city, CITY, CITY_WORD),
+            ):
+                for name in (names or {}).values():
+                    for variant in variants(name):
+                        entries.add((variant, kind, code))
+                        for word in WORD_SEPARATORS.split(variant):
+                            if word and word != variant:
+                                entries.add((word, word_kind, code))
+
+        entries = sorted(entries)
+        self.keys = [key for key, _, _ in entries]
+        self.entries = entries
+
+    def search(self, query, limit=10):
+        """ Return airport codes whose keys start with `query`, best matches first. """
+        scores = {}
+
+        for prefix in variants(query.strip()):
+            if not prefix:
+                continue
+
+            i = bisect.bisect_left(self.keys, prefix)
+            while i < len(self.keys) and self.keys[i].startswith(prefix):
+                key, kind, code = self.entries[i]
+                # Exact matches rank ahead of prefix matches of the same kind
+                score = kind * 2 + (key != prefix)
+                if score < scores.get(code, len(self.entries)):
+                    scores[code] = score
+                i += 1
+
+        return sorted(scores, key=lambda code: (scores[code], code))[:limit]
+
+
+_lock = threading.Lock()
+_index = None
+_indexed_airports = None
+
+
+def get_airport_index():
+    """ Return the prefix index, rebuilding it if the registry's airports were reloaded. """
+    global _index, _indexed_airports
+
+    airports = registry.airports
+    if airports is not _indexed_airports:
+        with _lock:
+            if airports is not _indexed_airports:
+                _index = AirportPrefixIndex(airports)
+                _indexed_airports = airports
+
+    return _index
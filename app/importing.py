@@ -0,0 +1,191 @@
+"""
+Parsing and validation of booking drops for the import_bookings command.
+
+Chunks are parsed in worker processes, so this module does not touch Django:
+it only turns raw NDJSON/CSV lines into tuples ready for COPY. Values restricted
+to model choices are checked against the `choices` the command passes in.
+"""
+import csv
+import datetime
+import gzip
+import json
+from decimal import Decimal, InvalidOperation
+
+class InvalidRow(ValueError):
+    pass
+
+
+def parse_str(value):
+    # Rejects JSON null, numbers, lists and objects, which str() would quietly turn into text
+    if not isinstance(value, str):
+        raise InvalidRow(f"expected a string, got {type(value).__name__}")
+    return value.strip()
+
+
+def parse_code(length):
+    def parse(value):
+        value = parse_str(value)
+        if not value or len(value) > length:
+            raise InvalidRow(f"expected at most {length} characters, got {value!r}")
+        return value
+    return parse
+
+
+def parse_text(value):
+    value = parse_str(value)
+    if not value:
+        raise InvalidRow("expected a non-empty value")
+    return value
+
+
+def parse_int(value):
+    # int() would truncate floats and accept booleans
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value
+    if isinstance(value, str):
+        try:
+            return int(value)
+        except ValueError:
+            pass
+    raise InvalidRow(f"expected an integer, got {value!r}")
+
+
+def parse_datetime(value):
+    try:
+        value = datetime.datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise InvalidRow(f"expected an ISO 8601 datetime, got {value!r}")
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=datetime.timezone.utc)
+    return value
+
+
+def parse_amount(value):
+    try:
+        amount = Decimal(str(value))
+    except InvalidOperation:
+        raise InvalidRow(f"expected an amount, got {value!r}")
+    if not amount.is_finite() or amount < 0 or amount.as_tuple().exponent < -2 or abs(amount) >= 10 ** 8:
+        raise InvalidRow(f"amount out of range: {value!r}")
+    return amount
+
+
+def parse_contact_data(value):
+    # CSV carries the JSON as a string, NDJSON as an object
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except ValueError:
+            raise InvalidRow(f"contact_data is not valid JSON: {value!r}")
+    if not isinstance(value, dict):
+        raise InvalidRow("contact_data must be a JSON object")
+    # Kept as text, COPY casts it to jsonb
+    return json.dumps(value, ensure_ascii=False)
+
+
+# Kind -> (column, parser) in staging table order; the columns are the model field names
+# and the NDJSON keys / CSV header names of the input files
+COLUMNS = {
+    'bookings': [
+        ('book_ref', parse_code(6)),
+        ('book_date', parse_datetime),
+        ('total_amount', parse_amount),
+    ],
+    'tickets': [
+        ('ticket_no', parse_code(13)),
+        ('book_ref', parse_code(6)),
+        ('passenger_id', parse_code(20)),
+        ('passenger_name', parse_text),
+        ('contact_data', parse_contact_data),
+    ],
+    'ticket_flights': [
+        ('ticket_no', parse_code(13)),
+        ('flight_id', parse_int),
+        ('fare_condition', parse_text),
+        ('amount', parse_amount),
+    ],
+}
+
+
+def open_text(path):
+    if str(path).endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8', newline='')
+    return open(path, encoding='utf-8', newline='')
+
+
+def get_format(path):
+    name = str(path).removesuffix('.gz')
+    if name.endswith('.csv'):
+        return 'csv'
+    if name.endswith(('.ndjson', '.jsonl', '.json')):
+        return 'ndjson'
+    raise ValueError(f"cannot tell the format of {path}, expected .csv or .ndjson (optionally .gz)")
+
+
+def read_chunks(path, chunk_size):
+    """
+    Yield (first line number, header, lines) chunks of the file without parsing them.
+    CSV records must not span lines, which holds for the booking drops.
+    """
+    with open_text(path) as f:
+        header = None
+        line_no = 1
+        if get_format(path) == 'csv':
+            header = next(csv.reader([f.readline()]), None)
+            line_no = 2
+
+        chunk = []
+        for line in f:
+            chunk.append(line)
+            if len(chunk) == chunk_size:
+                yield line_no, header, chunk
+                line_no += len(chunk)
+                chunk = []
+        if chunk:
+            yield line_no, header, chunk
+
+
+def parse_field(record, name, parse, choices):
+    try:
+        value = parse(record[name])
+        if name in choices and value not in choices[name]:
+            raise InvalidRow(f"expected one of {', '.join(sorted(choices[name]))}, got {value!r}")
+        return value
+    except InvalidRow as e:
+        raise InvalidRow(f"{name}: {e}")
+
+
+def parse_chunk(kind, line_no, header, lines, choices=None):
+    """
+    Parse and validate a chunk of lines. `choices` maps columns to their valid values.
+    Returns (rows, line numbers, errors): rows being tuples in COLUMNS order, line
+    numbers those of the rows and errors (line number, message) pairs.
+    """
+    columns = COLUMNS[kind]
+    choices = choices or {}
+    rows, numbers, errors = [], [], []
+
+    if header is not None:
+        missing = [name for name, _ in columns if name not in header]
+        if missing:
+            return [], [], [(line_no, f"CSV header lacks columns {', '.join(missing)}")]
+        lines = csv.reader(lines)
+
+    for number, line in enumerate(lines, line_no):
+        if not line or (header is None and not line.strip()):
+            continue
+
+        try:
+            record = json.loads(line) if header is None else dict(zip(header, line))
+            if not isinstance(record, dict):
+                raise InvalidRow(f"expected an object, got {type(record).__name__}")
+            rows.append(tuple(parse_field(record, name, parse, choices) for name, parse in columns))
+            numbers.append(number)
+        except KeyError as e:
+            errors.append((number, f"missing {e.args[0]}"))
+        except InvalidRow as e:
+            errors.append((number, str(e)))
+        except ValueError as e:
+            errors.append((number, f"invalid JSON: {e}"))
+
+    return rows, numbers, errors
@@ -0,0 +1,141 @@
+import cProfile
+import io
+import json
+import pstats
+import sys
+import time
+import tracemalloc
+from contextlib import ExitStack, contextmanager
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.utils import timezone
+
+
+class Phase:
+    """ Measurements of one named phase of a command run. """
+    __slots__ = ('name', 'seconds', 'rows', 'queries', 'peak_memory')
+
+    def __init__(self, name):
+        self.name = name
+        self.seconds = 0.0
+        self.rows = None
+        self.queries = 0
+        self.peak_memory = None
+
+    @property
+    def rows_per_second(self):
+        if self.rows is None or not self.seconds:
+            return None
+        return self.rows / self.seconds
+
+    def as_dict(self):
+        return {
+            'name': self.name,
+            'seconds': round(self.seconds, 3),
+            'rows': self.rows,
+            'rows_per_second': None if self.rows_per_second is None else round(self.rows_per_second, 1),
+            'queries': self.queries,
+            'peak_memory_bytes': self.peak_memory,
+        }
+
+
+class InstrumentedCommand(BaseCommand):
+    """
+    Base class for management commands, adding:
+
+      --profile PATH    cProfile the run, save the stats to PATH and print the top functions
+      --trace-memory    record the tracemalloc peak of every phase
+      --report PATH     write the phase timings as JSON
+
+    Commands split their work with `with self.phase('name') as phase:` and may set
+    `phase.rows` to get a rows/sec figure. Each phase records its wall time and the
+    number of database queries it ran on every connection.
+    """
+
+    def create_parser(self, prog_name, subcommand, **kwargs):
+        parser = super().create_parser(prog_name, subcommand, **kwargs)
+        group = parser.add_argument_group('instrumentation')
+        group.add_argument('--profile', metavar='PATH', help='Save cProfile stats of the run to PATH')
+        group.add_argument('--trace-memory', action='store_true', help='Record the peak memory of every phase')
+        group.add_argument('--report', metavar='PATH', help='Write a JSON report of the phases to PATH')
+        return parser
+
+    @contextmanager
+    def phase(self, name):
+        phase = Phase(name)
+        self.phases.append(phase)
+
+        def count_query(execute, sql, params, many, context):
+            phase.queries += 1
+            return execute(sql, params, many, context)
+
+        if tracemalloc.is_tracing():
+            tracemalloc.reset_peak()
+
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for alias in connections:
+                    stack.enter_context(connections[alias].execute_wrapper(count_query))
+                yield phase
+        finally:
+            phase.seconds = time.perf_counter() - start
+            if tracemalloc.is_tracing():
+                phase.peak_memory = tracemalloc.get_traced_memory()[1]
+
+    def execute(self, *args, **options):
+        self.phases = []
+        profiler = cProfile.Profile() if options.get('profile') else None
+
+        if options.get('trace_memory'):
+            tracemalloc.start()
+
+        started_at = timezone.now()
+        start = time.perf_counter()
+        try:
+            if profiler:
+                profiler.enable()
+            return super().execute(*args, **options)
+        finally:
+            if profiler:
+                profiler.disable()
+            total = time.perf_counter() - start
+
+            if self.phases:
+                self.write_phases(total)
+            if profiler:
+                self.write_profile(profiler, options['profile'])
+            if options.get('report'):
+                self.write_report(options['report'], started_at, total)
+            if options.get('trace_memory'):
+                tracemalloc.stop()
+
+    def write_phases(self, total):
+        self.stderr.write(f"{'phase':<32}{'seconds':>10}{'rows':>12}{'rows/s':>12}{'queries':>10}{'peak MB':>10}")
+        for phase in self.phases:
+            rows = '-' if phase.rows is None else phase.rows
+            rate = '-' if phase.rows_per_second is None else f"{phase.rows_per_second:.0f}"
+            memory = '-' if phase.peak_memory is None else f"{phase.peak_memory / 2 ** 20:.1f}"
+            self.stderr.write(f"{phase.name:<32}{phase.seconds:>10.2f}{rows:>12}{rate:>12}{phase.queries:>10}{memory:>10}")
+        self.stderr.write(f"{'total':<32}{total:>10.2f}")
+
+    def write_profile(self, profiler, path):
+        profiler.dump_stats(path)
+
+        output = io.StringIO()
+        pstats.Stats(profiler, stream=output).sort_stats('cumulative').print_stats(20)
+        self.stderr.write(output.getvalue())
+        self.stderr.write(f"Profile saved to {path}")
+
+    def write_report(self, path, started_at, total):
+        report = {
+            'command': self.__module__.rsplit('.', 1)[-1],
+            'argv': sys.argv[1:],
+            'started_at': started_at.isoformat(),
+            'seconds': round(total, 3),
+            'phases': [phase.as_dict() for phase in self.phases],
+        }
+        with open(path, 'w') as f:
+            json.dump(report, f, indent=2)
+        self.stderr.write(f"Report written to {path}")
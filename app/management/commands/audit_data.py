@@ -0,0 +1,93 @@
+import json
+import multiprocessing
+import os
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import django
+from django.core.management.base import CommandError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections
+from django.utils import timezone
+
+from app.audit import CHECKS, get_key_ranges, run_check
+from app.management.base import InstrumentedCommand
+
+
+class Command(InstrumentedCommand):
+    help = ('Check data integrity invariants of bookings, tickets, ticket flights and boarding passes. '
+            'Every check runs as set-based queries over key ranges spread across worker processes; '
+            'discrepancies are written to an NDJSON file as they are found.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='append', choices=sorted(CHECKS), dest='checks',
+                            help='Run only this check (repeatable), all by default')
+        parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                            help='Worker processes, each with its own connection; 0 runs in this process')
+        parser.add_argument('--partitions', type=int, default=None,
+                            help='Key ranges per check (default 8 per worker)')
+        parser.add_argument('--output', default=None,
+                            help='Discrepancies file (default audit-<timestamp>.ndjson)')
+        parser.add_argument('--fail', action='store_true', help='Exit with an error if discrepancies are found')
+
+    def get_tasks(self, checks, partitions):
+        """ (check, low, high) for every check and key range; ranges are computed once per key model. """
+        ranges = {}
+        tasks = []
+        for name in checks:
+            model = CHECKS[name][0]
+            if model not in ranges:
+                ranges[model] = get_key_ranges(model, partitions)
+            tasks.extend((name, low, high) for low, high in ranges[model])
+        return tasks
+
+    def run(self, tasks, workers):
+        """ Yield run_check results as they complete. """
+        if not workers:
+            for task in tasks:
+                yield run_check(*task)
+            return
+
+        # Spawned workers (spawn being available on every platform, Windows included) set
+        # Django up themselves and open their own connections
+        connections.close_all()
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=django.setup) as executor:
+            futures = [executor.submit(run_check, *task) for task in tasks]
+            for future in as_completed(futures):
+                yield future.result()
+
+    def handle(self, *args, **options):
+        checks = options['checks'] or list(CHECKS)
+        workers = max(options['workers'], 0)
+        partitions = options['partitions'] or max(workers, 1) * 8
+        output = options['output'] or f"audit-{timezone.now():%Y%m%d-%H%M%S}.ndjson"
+
+        with self.phase('partition keys') as phase:
+            tasks = self.get_tasks(checks, partitions)
+            phase.rows = len(tasks)
+
+        found = Counter()
+        seconds = defaultdict(float)
+        with open(output, 'w') as f, self.phase('run checks') as phase:
+            for done, (name, rows, elapsed) in enumerate(self.run(tasks, workers), 1):
+                for row in rows:
+                    f.write(json.dumps({'check': name, **row}, cls=DjangoJSONEncoder, ensure_ascii=False) + '\n')
+                f.flush()
+                found[name] += len(rows)
+                seconds[name] += elapsed
+                print(f"{done}/{len(tasks)} ranges checked, {sum(found.values())} discrepancies")
+            phase.rows = sum(found.values())
+
+        self.stdout.write(f"{'check':<40}{'discrepancies':>15}{'query seconds':>15}")
+        for name in checks:
+            line = f"{name:<40}{found[name]:>15}{seconds[name]:>15.1f}"
+            self.stdout.write(self.style.ERROR(line) if found[name] else line)
+            if found[name]:
+                self.stdout.write(f"  {CHECKS[name][1]}")
+
+        total = sum(found.values())
+        if total and options['fail']:
+            raise CommandError(f"{total} discrepancies found, see {output}.")
+
+        self.stdout.write(self.style.SUCCESS(f"Audit completed, {total} discrepancies written to {output}"))
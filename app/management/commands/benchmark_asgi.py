@@ -0,0 +1,64 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = 'Compare throughput of the sync endpoints under WSGI with the async endpoints under ASGI'
+
+    # (sync path, async path) pairs
+    endpoints = [
+        ('/api/v1/airports/', '/api/v1/async/airports/'),
+        ('/api/v1/airport-statistics/?sort_field=passengers_count&sort_order=desc',
+         '/api/v1/async/airport-statistics/?sort_field=passengers_count&sort_order=desc'),
+    ]
+
+    def add_arguments(self, parser):
+        parser.add_argument('--wsgi-url', default='http://127.0.0.1:8000',
+                            help='Base URL of the server started with the WSGI application')
+        parser.add_argument('--asgi-url', default='http://127.0.0.1:8001',
+                            help='Base URL of the server started with the ASGI application')
+        parser.add_argument('--sessionid', required=True, help='Session cookie of a logged in user')
+        parser.add_argument('--concurrency', type=int, default=100)
+        parser.add_argument('--requests', type=int, default=5000)
+
+    def run(self, url, sessionid, concurrency, total):
+        session = requests.Session()
+        session.cookies.set('sessionid', sessionid)
+        adapter = requests.adapters.HTTPAdapter(pool_connections=concurrency, pool_maxsize=concurrency)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+
+        def fetch(_):
+            try:
+                return session.get(url, timeout=30).status_code == 200
+            except requests.RequestException:
+                return False
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            succeeded = sum(executor.map(fetch, range(total)))
+        elapsed = time.perf_counter() - start
+
+        return total / elapsed, total - succeeded
+
+    def handle(self, *args, **options):
+        # EXPOSE_QUERY_COUNT=False keeps QueryCountMiddleware (and its per-query wrapper)
+        # out of both stacks, so only the views themselves are compared
+        self.stdout.write(
+            'Run both servers pinned to the same CPU budget and without the query count middleware, e.g.\n'
+            '  EXPOSE_QUERY_COUNT=False taskset -c 0 gunicorn FlightSystem.wsgi -w 1 --threads 8 -b :8000\n'
+            '  EXPOSE_QUERY_COUNT=False taskset -c 0 uvicorn FlightSystem.asgi:application --port 8001\n'
+        )
+
+        for sync_path, async_path in self.endpoints:
+            for name, url in (
+                    ('WSGI', options['wsgi_url'] + sync_path),
+                    ('ASGI', options['asgi_url'] + async_path),
+            ):
+                throughput, errors = self.run(url, options['sessionid'], options['concurrency'], options['requests'])
+                self.stdout.write(f'{name} {url}: {throughput:.1f} req/s, {errors} errors')
+
+        self.stdout.write(self.style.SUCCESS('Benchmark completed!'))
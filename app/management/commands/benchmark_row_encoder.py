@@ -0,0 +1,67 @@
+import datetime
+import random
+import time
+from types import SimpleNamespace
+
+from django.core.management.base import BaseCommand
+
+from api.v1.encoders import get_row_encoder
+from api.v1.serializers import AirportSerializer, AirportStatsResponseSerializer
+
+
+class Command(BaseCommand):
+    help = 'Compare DRF serializers with the compiled row encoders on synthetic rows'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, nargs='+', default=[1000, 100000])
+        parser.add_argument('--repeat', type=int, default=3)
+
+    def make_airport_row(self, i):
+        return f'Airport {i}', f'{i % 1000:03d}'
+
+    def make_stats_row(self, i):
+        return (
+            f'A{i % 100:02d}-B{i % 97:02d}',
+            f'Airport {i % 100}',
+            f'Airport {i % 97}',
+            random.uniform(100, 9000),
+            random.randint(1, 5000),
+            random.randint(1, 500000),
+            datetime.timedelta(minutes=random.randint(30, 600)),
+        )
+
+    def best_of(self, repeat, func):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - start)
+        return min(timings)
+
+    def benchmark(self, serializer_class, make_row, rows_count, repeat):
+        encoder = get_row_encoder(serializer_class)
+
+        rows = [make_row(i) for i in range(rows_count)]
+        # Model-like objects carrying the same values as attributes, as the ORM would return them
+        objects = [SimpleNamespace(**dict(zip(encoder.sources, row))) for row in rows]
+
+        if serializer_class(objects, many=True).data != encoder.encode(rows):
+            self.stdout.write(self.style.ERROR(f'{serializer_class.__name__}: encoder output differs!'))
+            return
+
+        serializer_time = self.best_of(repeat, lambda: serializer_class(objects, many=True).data)
+        encoder_time = self.best_of(repeat, lambda: encoder.encode(rows))
+
+        self.stdout.write(
+            f'{serializer_class.__name__:<32} {rows_count:>8} rows  '
+            f'serializer {serializer_time * 1000:9.1f} ms  '
+            f'encoder {encoder_time * 1000:8.1f} ms  '
+            f'x{serializer_time / encoder_time:.1f}'
+        )
+
+    def handle(self, *args, **options):
+        for rows_count in options['rows']:
+            self.benchmark(AirportSerializer, self.make_airport_row, rows_count, options['repeat'])
+            self.benchmark(AirportStatsResponseSerializer, self.make_stats_row, rows_count, options['repeat'])
+
+        self.stdout.write(self.style.SUCCESS('Benchmark completed!'))
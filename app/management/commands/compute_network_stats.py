@@ -0,0 +1,95 @@
+import numpy as np
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+from app.management.base import InstrumentedCommand
+from app.models import Airport, AirportNetworkStats, AirportStats, Flight
+
+
+class Command(InstrumentedCommand):
+    help = 'Compute airport route network metrics as adjacency matrices and store them'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--source', choices=['stats', 'flights'], default='stats',
+                            help='Read routes from airport_stats (default) or aggregate them from flights')
+
+    def load_routes(self, source):
+        """ Return (departure code, arrival code, flights, passengers) per route. """
+        if source == 'stats':
+            return list(AirportStats.objects.filter(flights_count__gt=0).values_list(
+                'departure_airport_id', 'arrival_airport_id', 'flights_count', 'passengers_count'
+            ))
+
+        return list(Flight.objects.values('departure_airport_id', 'arrival_airport_id').annotate(
+            flights=Count('flight_id'), passengers=Sum('passenger_count'),
+        ).values_list('departure_airport_id', 'arrival_airport_id', 'flights', 'passengers'))
+
+    def compute(self, codes, routes):
+        """
+        Build the route matrices and compute all metrics in one vectorized pass.
+        Returns a dict of metric name -> array indexed like `codes`.
+        """
+        n = len(codes)
+        position = {code: i for i, code in enumerate(codes)}
+
+        pairs = [(position[dep], position[arr], f, p or 0) for dep, arr, f, p in routes
+                 if dep in position and arr in position and dep != arr]
+        rows = np.array([p[0] for p in pairs], dtype=np.intp)
+        cols = np.array([p[1] for p in pairs], dtype=np.intp)
+
+        adjacency = np.zeros((n, n), dtype=np.int64)
+        adjacency[rows, cols] = 1
+
+        flights = np.zeros((n, n), dtype=np.int64)
+        np.add.at(flights, (rows, cols), np.array([p[2] for p in pairs], dtype=np.int64))
+
+        passengers = np.zeros((n, n), dtype=np.int64)
+        np.add.at(passengers, (rows, cols), np.array([p[3] for p in pairs], dtype=np.int64))
+
+        # Pairs (i, j) with no direct route
+        missing = 1 - adjacency
+        np.fill_diagonal(missing, 0)
+
+        # transfer_pairs[k] = sum over i, j of A[i, k] * missing[i, j] * A[k, j]
+        transfer_pairs = (adjacency * (missing @ adjacency.T)).sum(axis=0)
+
+        # Reachable with at most one connection: A + A^2, excluding the airport itself
+        reach = (adjacency + adjacency @ adjacency) > 0
+        np.fill_diagonal(reach, False)
+
+        return {
+            'out_degree': adjacency.sum(axis=1),
+            'in_degree': adjacency.sum(axis=0),
+            'flights_count': flights.sum(axis=1) + flights.sum(axis=0),
+            'passengers_count': passengers.sum(axis=1) + passengers.sum(axis=0),
+            'transfer_pairs': transfer_pairs,
+            'two_hop_reach': reach.sum(axis=1),
+        }
+
+    def handle(self, *args, **options):
+        with self.phase('load routes') as phase:
+            codes = sorted(Airport.objects.values_list('airport_code', flat=True))
+            routes = self.load_routes(options['source'])
+            phase.rows = len(routes)
+
+        with self.phase('compute metrics') as phase:
+            metrics = self.compute(codes, routes)
+            phase.rows = len(codes)
+
+        computed_at = timezone.now()
+        objects = [
+            AirportNetworkStats(
+                airport_id=code,
+                computed_at=computed_at,
+                **{name: int(values[i]) for name, values in metrics.items()},
+            )
+            for i, code in enumerate(codes)
+        ]
+
+        with self.phase('save metrics') as phase, transaction.atomic():
+            AirportNetworkStats.objects.all().delete()
+            AirportNetworkStats.objects.bulk_create(objects)
+            phase.rows = len(objects)
+
+        self.stdout.write(self.style.SUCCESS(f'Network metrics stored for {len(objects)} airports'))
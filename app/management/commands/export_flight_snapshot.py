@@ -0,0 +1,148 @@
+import itertools
+
+import numpy as np
+from django.core.management.base import CommandError
+from django.utils import timezone
+
+from app.management.base import InstrumentedCommand
+from app.models import Flight
+from app.snapshot import COLUMNS, DTYPES, FlightSnapshot, get_snapshot_dir, write_snapshot
+
+# Snapshot column -> Flight field it is read from
+SOURCES = {
+    'flight_id': 'flight_id',
+    'flight_no': 'flight_no',
+    'departure_airport': 'departure_airport_id',
+    'arrival_airport': 'arrival_airport_id',
+    'aircraft_code': 'aircraft_code_id',
+    'status': 'status',
+    'scheduled_departure': 'scheduled_departure',
+    'scheduled_arrival': 'scheduled_arrival',
+    'actual_departure': 'actual_departure',
+    'actual_arrival': 'actual_arrival',
+    'passenger_count': 'passenger_count',
+}
+
+
+# int64 value of NaT
+NAT = np.iinfo(np.int64).min
+
+
+def encode_datetimes(values):
+    seconds = np.fromiter((NAT if value is None else int(value.timestamp()) for value in values),
+                          dtype=np.int64, count=len(values))
+    return seconds.view('datetime64[s]')
+
+
+class Command(InstrumentedCommand):
+    help = ('Export flights into the columnar snapshot used by app.snapshot.FlightSnapshot. By default only '
+            'flights after the last exported flight_id are added; --from-id/--to-id also re-read a range '
+            'of existing flights, e.g. the ones whose status or passenger count changed.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help='Rebuild the snapshot from scratch')
+        parser.add_argument('--from-id', type=int, help='Re-read flights with flight_id >= this one')
+        parser.add_argument('--to-id', type=int, help='Re-read flights with flight_id <= this one')
+        parser.add_argument('--directory', default=None, help='Snapshot directory (default FLIGHT_SNAPSHOT_DIR)')
+
+    chunk_size = 50000
+
+    def fetch(self, flights, dictionaries):
+        """ Flights as column arrays, extending the append-only dictionaries with new values. """
+        positions = {
+            name: {value: i for i, value in enumerate(dictionaries.setdefault(name, []))}
+            for name, kind in COLUMNS.items() if kind == 'dictionary'
+        }
+
+        def encode(name, values):
+            # New values once per distinct value, then one lookup per row into a code array
+            for value in dict.fromkeys(values):
+                if value not in positions[name]:
+                    positions[name][value] = len(dictionaries[name])
+                    dictionaries[name].append(value)
+            return np.fromiter(map(positions[name].__getitem__, values), dtype=np.int32, count=len(values))
+
+        rows = flights.order_by('flight_id').values_list(*SOURCES.values()).iterator(chunk_size=self.chunk_size)
+        chunks = {name: [] for name in COLUMNS}
+        while batch := list(itertools.islice(rows, self.chunk_size)):
+            values = dict(zip(SOURCES, zip(*batch)))
+            values['route'] = tuple(map('{}-{}'.format, values['departure_airport'], values['arrival_airport']))
+
+            for name, kind in COLUMNS.items():
+                if kind == 'dictionary':
+                    chunks[name].append(encode(name, values[name]))
+                elif kind == 'datetime':
+                    chunks[name].append(encode_datetimes(values[name]))
+                else:
+                    chunks[name].append(np.fromiter(values[name], dtype=DTYPES[kind], count=len(batch)))
+
+        return {
+            name: np.concatenate(arrays) if arrays else np.empty(0, dtype=DTYPES[COLUMNS[name]])
+            for name, arrays in chunks.items()
+        }
+
+    def handle(self, *args, **options):
+        directory = options['directory'] or get_snapshot_dir()
+
+        with self.phase('load snapshot') as phase:
+            snapshot = None
+            if not options['full']:
+                try:
+                    snapshot = FlightSnapshot.open(directory)
+                except FileNotFoundError:
+                    self.stdout.write("No snapshot yet, exporting all flights...")
+            phase.rows = len(snapshot) if snapshot else 0
+
+        if snapshot is None:
+            flights = Flight.objects.all()
+            dictionaries = {}
+        else:
+            last_id = snapshot.meta['max_flight_id']
+            flights = Flight.objects.filter(flight_id__gt=last_id)
+            if options['from_id'] is not None or options['to_id'] is not None:
+                refreshed = Flight.objects.filter(flight_id__gte=options['from_id'] or 0)
+                if options['to_id'] is not None:
+                    refreshed = refreshed.filter(flight_id__lte=options['to_id'])
+                flights = flights | refreshed
+            dictionaries = {name: list(values) for name, values in snapshot.dictionaries.items()}
+
+        with self.phase('fetch flights') as phase:
+            fetched = self.fetch(flights, dictionaries)
+            phase.rows = len(fetched['flight_id'])
+
+        with self.phase('merge') as phase:
+            if snapshot is None:
+                arrays = fetched
+            else:
+                # Rows re-read from the database replace their old versions; flights deleted
+                # in the re-read range disappear with them
+                keep = np.ones(len(snapshot), dtype=bool)
+                if options['from_id'] is not None or options['to_id'] is not None:
+                    ids = snapshot['flight_id']
+                    low = np.searchsorted(ids, options['from_id'] or 0, side='left')
+                    high = np.searchsorted(ids, options['to_id'], side='right') if options['to_id'] is not None \
+                        else len(ids)
+                    keep[low:high] = False
+
+                arrays = {
+                    name: np.concatenate([snapshot[name][keep], fetched[name]]) for name in COLUMNS
+                }
+                order = np.argsort(arrays['flight_id'], kind='stable')
+                arrays = {name: values[order] for name, values in arrays.items()}
+            phase.rows = len(arrays['flight_id'])
+
+        if not len(arrays['flight_id']):
+            raise CommandError("There are no flights to export.")
+
+        with self.phase('write') as phase:
+            path = write_snapshot(directory, arrays, {
+                'rows': len(arrays['flight_id']),
+                'max_flight_id': int(arrays['flight_id'][-1]),
+                'exported_at': timezone.now().isoformat(),
+                'dictionaries': dictionaries,
+            })
+            phase.rows = len(arrays['flight_id'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Flight snapshot written to {path}: {len(arrays['flight_id'])} flights, {len(fetched['flight_id'])} read"
+        ))
@@ -0,0 +1,309 @@
+import csv
+import io
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import CommandError
+from django.db import connection, transaction
+from django.db.models import Avg, Count, F
+
+from api.v1.signals import calculate_distance, maintains_stats_table
+from app.importing import COLUMNS, get_format, parse_chunk, read_chunks
+from app.management.base import InstrumentedCommand
+from app.models import AirportStats, Booking, Flight, Seat, Ticket, TicketFlight
+from app.registry import registry
+
+# Files are imported in this order, each one's keys being needed by the next
+KINDS = ['bookings', 'tickets', 'ticket_flights']
+
+# Kind -> (staging column, key set it must be found in)
+REFERENCES = {
+    'tickets': [('book_ref', 'bookings')],
+    'ticket_flights': [('ticket_no', 'tickets'), ('flight_id', 'flights')],
+}
+
+# Kind -> {column: valid values}, checked by the parsers
+CHOICES = {
+    'ticket_flights': {'fare_condition': frozenset(Seat.FareConditionChoices.values)},
+}
+
+
+def staging_table(kind):
+    return f"import_{kind}"
+
+
+class Command(InstrumentedCommand):
+    help = ('Import bookings, tickets and ticket flights from NDJSON or CSV files (optionally gzipped). '
+            'Rows are parsed in worker processes, COPY-ed into staging tables and merged with upserts; '
+            'flight passenger counts and route statistics are updated once per chunk.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--bookings', metavar='PATH')
+        parser.add_argument('--tickets', metavar='PATH')
+        parser.add_argument('--ticket-flights', metavar='PATH')
+        parser.add_argument('--chunk-size', type=int, default=50000, help='Rows per chunk and transaction')
+        parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                            help='Parser processes, 0 to parse in this process')
+        parser.add_argument('--max-errors', type=int, default=1000,
+                            help='Abort once this many rows were rejected')
+
+    # Keys
+
+    def load_keys(self, options):
+        """ Keys of existing rows that imported rows may reference, as in-memory sets. """
+        keys = {}
+        if options['tickets']:
+            keys['bookings'] = set(Booking.objects.values_list('book_ref', flat=True).iterator(chunk_size=100000))
+        if options['ticket_flights']:
+            keys['tickets'] = set(Ticket.objects.values_list('ticket_no', flat=True).iterator(chunk_size=100000))
+            keys['flights'] = set(Flight.objects.values_list('flight_id', flat=True).iterator(chunk_size=100000))
+        return keys
+
+    def resolve(self, kind, rows, numbers, keys):
+        """ Drop rows whose references are unknown, recording them as errors at their line numbers. """
+        checks = [
+            ([name for name, _ in COLUMNS[kind]].index(column), column, keys[key_set])
+            for column, key_set in REFERENCES.get(kind, [])
+        ]
+        if not checks:
+            return rows
+
+        resolved = []
+        for row, number in zip(rows, numbers):
+            for position, column, known in checks:
+                if row[position] not in known:
+                    self.reject(number, f"unknown {column} {row[position]!r}")
+                    break
+            else:
+                resolved.append(row)
+        return resolved
+
+    def reject(self, line_no, message):
+        self.errors += 1
+        if self.errors <= 20:
+            self.stderr.write(f"  {self.current_file}:{line_no}: {message}")
+        if self.errors > self.max_errors:
+            raise CommandError(f"More than {self.max_errors} rows rejected, aborting.")
+
+    # Database
+
+    def create_staging_tables(self, cursor):
+        sources = {'bookings': Booking, 'tickets': Ticket, 'ticket_flights': TicketFlight}
+        for kind, model in sources.items():
+            columns = ', '.join(
+                model._meta.get_field(name).column for name, _ in COLUMNS[kind]
+            )
+            # Column types of the target table, without its constraints
+            cursor.execute(
+                f'CREATE TEMP TABLE IF NOT EXISTS "{staging_table(kind)}" AS '
+                f'SELECT {columns} FROM "{model._meta.db_table}" WITH NO DATA'
+            )
+
+    def copy_rows(self, cursor, kind, rows):
+        table = staging_table(kind)
+        cursor.execute(f'TRUNCATE "{table}"')
+        raw_cursor = cursor.cursor  # The driver's cursor under Django's wrapper
+
+        if hasattr(raw_cursor, 'copy'):
+            # psycopg 3 COPY FROM STDIN
+            with raw_cursor.copy(f'COPY "{table}" FROM STDIN') as copy:
+                for row in rows:
+                    copy.write_row(row)
+        elif hasattr(raw_cursor, 'copy_expert'):
+            # psycopg2 reads the data from a file; the parsers never produce None or empty strings,
+            # which COPY's CSV format would tell apart by quoting
+            buffer = io.StringIO()
+            csv.writer(buffer).writerows(rows)
+            buffer.seek(0)
+            raw_cursor.copy_expert(f'COPY "{table}" FROM STDIN WITH (FORMAT csv)', buffer)
+        else:
+            raise CommandError(f"{type(raw_cursor).__module__} does not support COPY, use psycopg or psycopg2.")
+
+    def merge_bookings(self, cursor):
+        cursor.execute(f"""
+            INSERT INTO "{Booking._meta.db_table}" (book_ref, book_date, total_amount)
+            SELECT DISTINCT ON (book_ref) book_ref, book_date, total_amount FROM "{staging_table('bookings')}"
+            ORDER BY book_ref
+            ON CONFLICT (book_ref) DO UPDATE
+            SET book_date = EXCLUDED.book_date, total_amount = EXCLUDED.total_amount
+        """)
+
+    def merge_tickets(self, cursor):
+        cursor.execute(f"""
+            INSERT INTO "{Ticket._meta.db_table}" (ticket_no, book_ref_id, passenger_id, passenger_name, contact_data)
+            SELECT DISTINCT ON (ticket_no) ticket_no, book_ref_id, passenger_id, passenger_name, contact_data
+            FROM "{staging_table('tickets')}"
+            ORDER BY ticket_no
+            ON CONFLICT (ticket_no) DO UPDATE
+            SET book_ref_id = EXCLUDED.book_ref_id, passenger_id = EXCLUDED.passenger_id,
+                passenger_name = EXCLUDED.passenger_name, contact_data = EXCLUDED.contact_data
+        """)
+
+    def merge_ticket_flights(self, cursor):
+        """
+        Update existing ticket flights and insert new ones, then add the new passengers to
+        their flights and routes in the same statement. Returns the routes that have no
+        statistics row yet, as (departure, arrival, passengers) rows.
+        """
+        ticket_flight = TicketFlight._meta.db_table
+        flight = Flight._meta.db_table
+        staging = staging_table('ticket_flights')
+
+        # There is no unique constraint on (ticket_no, flight_id) to upsert on
+        cursor.execute(f"""
+            UPDATE "{ticket_flight}" tf SET fare_condition = s.fare_condition, amount = s.amount
+            FROM "{staging}" s
+            WHERE tf.ticket_no = s.ticket_no AND tf.flight_id = s.flight_id
+        """)
+
+        if maintains_stats_table():
+            stats = AirportStats._meta.db_table
+            stats_update = f"""
+                , updated_stats AS (
+                    UPDATE "{stats}" st SET passengers_count = st.passengers_count + r.passengers
+                    FROM routes r
+                    WHERE st.flight_id = r.departure_airport_id || '-' || r.arrival_airport_id
+                    RETURNING st.flight_id
+                )
+                SELECT departure_airport_id, arrival_airport_id, passengers FROM routes
+                WHERE departure_airport_id || '-' || arrival_airport_id NOT IN (SELECT flight_id FROM updated_stats)
+            """
+        else:
+            stats_update = "SELECT departure_airport_id, arrival_airport_id, passengers FROM routes WHERE false"
+
+        cursor.execute(f"""
+            WITH inserted AS (
+                INSERT INTO "{ticket_flight}" (ticket_no, flight_id, fare_condition, amount, scheduled_departure)
+                SELECT DISTINCT ON (s.ticket_no, s.flight_id)
+                    s.ticket_no, s.flight_id, s.fare_condition, s.amount, f.scheduled_departure
+                FROM "{staging}" s
+                JOIN "{flight}" f ON f.flight_id = s.flight_id
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM "{ticket_flight}" tf WHERE tf.ticket_no = s.ticket_no AND tf.flight_id = s.flight_id
+                )
+                ORDER BY s.ticket_no, s.flight_id
+                RETURNING flight_id
+            ), flights AS (
+                UPDATE "{flight}" f SET passenger_count = f.passenger_count + i.passengers
+                FROM (SELECT flight_id, count(*) AS passengers FROM inserted GROUP BY flight_id) i
+                WHERE f.flight_id = i.flight_id
+                RETURNING f.departure_airport_id, f.arrival_airport_id, i.passengers
+            ), routes AS (
+                SELECT departure_airport_id, arrival_airport_id, sum(passengers) AS passengers
+                FROM flights GROUP BY departure_airport_id, arrival_airport_id
+            )
+            {stats_update}
+        """)
+        return cursor.fetchall()
+
+    def create_route_stats(self, routes):
+        """ Statistics rows for routes that had none, as the signal receivers would create them. """
+        for departure_airport_id, arrival_airport_id, passengers in routes:
+            departure_airport = registry.get_airport(departure_airport_id)
+            arrival_airport = registry.get_airport(arrival_airport_id)
+            flights = Flight.objects.filter(
+                departure_airport_id=departure_airport_id, arrival_airport_id=arrival_airport_id
+            ).aggregate(count=Count('pk'), flight_time=Avg(F('scheduled_arrival') - F('scheduled_departure')))
+
+            AirportStats.objects.create(
+                flight_id=f"{departure_airport_id}-{arrival_airport_id}",
+                departure_airport_name=departure_airport.airport_name,
+                arrival_airport_name=arrival_airport.airport_name,
+                departure_airport_id=departure_airport_id,
+                arrival_airport_id=arrival_airport_id,
+                distance_km=calculate_distance(departure_airport, arrival_airport),
+                flights_count=flights['count'],
+                passengers_count=passengers,
+                flight_time=flights['flight_time'],
+            )
+
+    def load_chunk(self, kind, rows):
+        with transaction.atomic(), connection.cursor() as cursor:
+            self.create_staging_tables(cursor)
+            self.copy_rows(cursor, kind, rows)
+
+            if kind == 'bookings':
+                self.merge_bookings(cursor)
+            elif kind == 'tickets':
+                self.merge_tickets(cursor)
+            else:
+                self.create_route_stats(self.merge_ticket_flights(cursor))
+
+    # Parsing
+
+    def parse(self, kind, path, options):
+        """ Yield (rows, line numbers) of parsed chunks in file order, keeping the workers busy. """
+        chunks = read_chunks(path, options['chunk_size'])
+        choices = CHOICES.get(kind)
+
+        if not options['workers']:
+            for line_no, header, lines in chunks:
+                yield self.collect(parse_chunk(kind, line_no, header, lines, choices))
+            return
+
+        # Spawned workers only import app.importing, which does not need Django to be set up;
+        # spawn is available on every platform, Windows included
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=options['workers'], mp_context=context) as executor:
+            pending = deque()
+            for line_no, header, lines in chunks:
+                pending.append(executor.submit(parse_chunk, kind, line_no, header, lines, choices))
+                # Bounded read-ahead so a large file is never held in memory
+                if len(pending) >= options['workers'] * 2:
+                    yield self.collect(pending.popleft().result())
+            while pending:
+                yield self.collect(pending.popleft().result())
+
+    def collect(self, result):
+        rows, numbers, errors = result
+        for line_no, message in errors:
+            self.reject(line_no, message)
+        return rows, numbers
+
+    def import_file(self, kind, path, keys, options):
+        self.current_file = path
+        imported = 0
+
+        with self.phase(kind) as phase:
+            for rows, numbers in self.parse(kind, path, options):
+                rows = self.resolve(kind, rows, numbers, keys)
+                if not rows:
+                    continue
+
+                self.load_chunk(kind, rows)
+                imported += len(rows)
+
+                # Later files may reference the rows just imported, keyed by their first column
+                if kind in keys:
+                    keys[kind].update(row[0] for row in rows)
+
+                print(f"{kind}: {imported} rows imported")
+            phase.rows = imported
+
+        self.stdout.write(self.style.SUCCESS(f"Imported {imported} {kind.replace('_', ' ')} from {path}"))
+
+    def handle(self, *args, **options):
+        files = {kind: options[kind] for kind in KINDS if options[kind]}
+        if not files:
+            raise CommandError("Nothing to import, pass --bookings, --tickets and/or --ticket-flights.")
+        for path in files.values():
+            try:
+                get_format(path)
+            except ValueError as e:
+                raise CommandError(e)
+
+        self.errors = 0
+        self.max_errors = options['max_errors']
+
+        with self.phase('load keys') as phase:
+            keys = self.load_keys(options)
+            phase.rows = sum(len(known) for known in keys.values())
+
+        for kind, path in files.items():
+            self.import_file(kind, path, keys, options)
+
+        if self.errors:
+            self.stdout.write(self.style.WARNING(f"{self.errors} rows rejected."))
+        self.stdout.write(self.style.SUCCESS("Booking import completed!"))
@@ -0,0 +1,120 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# What a cold process does before it can serve: set Django up, build the WSGI
+# handler (middleware), and additionally load the URLconf and so every view
+TARGETS = {
+    'setup': "import django; django.setup()",
+    'wsgi': "from django.core.wsgi import get_wsgi_application; get_wsgi_application()",
+    'urls': ("from django.core.wsgi import get_wsgi_application; get_wsgi_application(); "
+             "from django.urls import get_resolver; get_resolver().url_patterns"),
+}
+
+
+def parse_importtime(output):
+    """ Parse `python -X importtime` stderr into (module, self us, cumulative us) rows. """
+    rows = []
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        rows.append((name.strip(), int(self_us), int(cumulative_us)))
+    return rows
+
+
+class Command(BaseCommand):
+    help = ('Report the import cost of starting a process: wall time of cold starts and per-module '
+            'import times from `python -X importtime`, for one or more settings modules.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--compare', action='append', metavar='SETTINGS_MODULE',
+                            help='Settings module to measure (repeatable), the current one by default')
+        parser.add_argument('--target', choices=sorted(TARGETS), default='wsgi')
+        parser.add_argument('--runs', type=int, default=5, help='Cold starts timed per settings module')
+        parser.add_argument('--top', type=int, default=25, help='Number of modules listed')
+        parser.add_argument('--json', metavar='PATH', help='Write the measurements as JSON to PATH')
+
+    def run(self, settings_module, target, importtime=False):
+        env = {**os.environ, 'DJANGO_SETTINGS_MODULE': settings_module}
+        command = [sys.executable, *(['-X', 'importtime'] if importtime else []), '-c', TARGETS[target]]
+
+        start = time.perf_counter()
+        result = subprocess.run(command, cwd=settings.BASE_DIR, env=env, capture_output=True, text=True)
+        elapsed = time.perf_counter() - start
+
+        if result.returncode:
+            errors = [line for line in result.stderr.splitlines() if not line.startswith('import time:')]
+            raise CommandError(f"Starting with {settings_module} failed:\n" + '\n'.join(errors[-20:]))
+        return elapsed, result.stderr
+
+    def measure(self, settings_module, options):
+        self.stdout.write(f"Measuring {settings_module}...")
+        # The first start also warms the OS file cache and writes .pyc files
+        self.run(settings_module, options['target'])
+        wall_times = [self.run(settings_module, options['target'])[0] for _ in range(options['runs'])]
+        rows = parse_importtime(self.run(settings_module, options['target'], importtime=True)[1])
+
+        packages = defaultdict(int)
+        for name, self_us, _ in rows:
+            packages[name.split('.')[0]] += self_us
+
+        return {
+            'settings': settings_module,
+            'wall_seconds': {'min': min(wall_times), 'median': statistics.median(wall_times)},
+            'import_seconds': sum(self_us for _, self_us, _ in rows) / 1e6,
+            'modules': len(rows),
+            'packages': dict(sorted(packages.items(), key=lambda item: -item[1])),
+            'top_modules': [
+                {'module': name, 'self_us': self_us, 'cumulative_us': cumulative_us}
+                for name, self_us, cumulative_us in sorted(rows, key=lambda row: -row[2])[:options['top']]
+            ],
+        }
+
+    def write_report(self, report, top):
+        self.stdout.write(self.style.MIGRATE_HEADING(report['settings']))
+        self.stdout.write(f"  cold start {report['wall_seconds']['median'] * 1000:.0f} ms median, "
+                          f"{report['wall_seconds']['min'] * 1000:.0f} ms min; "
+                          f"{report['modules']} modules imported in {report['import_seconds'] * 1000:.0f} ms")
+
+        self.stdout.write(f"  {'package':<40}{'self ms':>10}")
+        for package, self_us in list(report['packages'].items())[:top]:
+            self.stdout.write(f"  {package:<40}{self_us / 1000:>10.1f}")
+
+        self.stdout.write(f"  {'module':<60}{'self ms':>10}{'cumul. ms':>11}")
+        for module in report['top_modules']:
+            self.stdout.write(f"  {module['module']:<60}{module['self_us'] / 1000:>10.1f}"
+                              f"{module['cumulative_us'] / 1000:>11.1f}")
+
+    def handle(self, *args, **options):
+        modules = options['compare'] or [os.environ['DJANGO_SETTINGS_MODULE']]
+        reports = [self.measure(module, options) for module in modules]
+
+        for report in reports:
+            self.write_report(report, options['top'])
+
+        if len(reports) > 1:
+            base = reports[0]
+            self.stdout.write(self.style.MIGRATE_HEADING(f"Compared to {base['settings']}"))
+            for report in reports[1:]:
+                # Negative differences are savings
+                wall_difference = report['wall_seconds']['median'] - base['wall_seconds']['median']
+                dropped = sorted(base['packages'].keys() - report['packages'].keys(),
+                                 key=lambda package: -base['packages'][package])
+                self.stdout.write(f"  {report['settings']}: cold start {wall_difference * 1000:+.0f} ms, "
+                                  f"modules {report['modules'] - base['modules']:+d}")
+                if dropped:
+                    self.stdout.write(f"  no longer imported: {', '.join(dropped)}")
+
+        if options['json']:
+            with open(options['json'], 'w') as f:
+                json.dump({'target': options['target'], 'reports': reports}, f, indent=2)
+
+        self.stdout.write(self.style.SUCCESS('Import time report completed!'))
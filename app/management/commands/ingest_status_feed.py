@@ -0,0 +1,58 @@
+import json
+import sys
+from collections import Counter
+
+from django.core.management.base import CommandError
+
+from app.importing import open_text
+from app.management.base import InstrumentedCommand
+from app.status_feed import MAX_BATCH_SIZE, apply_status_updates, clean_update
+
+
+class Command(InstrumentedCommand):
+    help = ('Apply flight status updates from an NDJSON file (or - for stdin), one object per line with '
+            'flight_id and any of status, actual_departure, actual_arrival, scheduled_departure, '
+            'scheduled_arrival, departure_airport and arrival_airport. Updates are applied in batches.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='NDJSON file, optionally gzipped, or - for stdin')
+        parser.add_argument('--batch-size', type=int, default=5000,
+                            help=f'Updates per transaction (at most {MAX_BATCH_SIZE})')
+
+    def batches(self, f, batch_size):
+        batch = []
+        for line_no, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                batch.append(clean_update(json.loads(line)))
+            except ValueError as e:
+                self.rejected += 1
+                if self.rejected <= 20:
+                    self.stderr.write(f"  line {line_no}: {e}")
+                continue
+            if len(batch) == batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        if not 0 < batch_size <= MAX_BATCH_SIZE:
+            raise CommandError(f"--batch-size must be between 1 and {MAX_BATCH_SIZE}.")
+
+        self.rejected = 0
+        totals = Counter()
+        f = sys.stdin if options['path'] == '-' else open_text(options['path'])
+
+        with f, self.phase('apply updates') as phase:
+            for batch in self.batches(f, batch_size):
+                totals.update(apply_status_updates(batch))
+                print(f"{totals['received']} updates applied...")
+            phase.rows = totals['received']
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{totals['received']} updates: {totals['updated']} flights changed, {totals['unchanged']} unchanged, "
+            f"{totals['unknown']} unknown, {totals['routes']} route statistics changes, {self.rejected} rejected."
+        ))
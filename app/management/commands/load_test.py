@@ -0,0 +1,144 @@
+import asyncio
+import json
+import random
+import time
+from collections import defaultdict
+
+import httpx
+from django.core.management.base import BaseCommand, CommandError
+
+LANGUAGES = ['en', 'ru']
+SORT_FIELDS = ['', 'departure_airport_id', 'arrival_airport_id', 'distance_km', 'flights_count',
+               'passengers_count', 'flight_time']
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+class Command(BaseCommand):
+    help = 'Load test the airport and statistics API endpoints of a running server'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', default='http://127.0.0.1:8000')
+        parser.add_argument('--sessionid', required=True, help='Session cookie of a logged in user')
+        parser.add_argument('--concurrency', type=int, default=50, help='Number of concurrent virtual users')
+        parser.add_argument('--duration', type=float, default=60, help='Test duration in seconds, after ramp-up')
+        parser.add_argument('--ramp-up', type=float, default=10, help='Seconds over which users are started')
+        parser.add_argument('--airports-weight', type=float, default=0.2,
+                            help='Share of requests going to the airport list, the rest go to statistics')
+        parser.add_argument('--max-page', type=int, default=50, help='Deepest statistics page requested')
+        parser.add_argument('--report', help='Write the results as JSON to this file')
+
+    def make_request(self, rng, airport_codes, options):
+        """ Return (scenario name, path, params, headers) of a random realistic request. """
+        headers = {'Accept-Language': rng.choice(LANGUAGES)}
+
+        if rng.random() < options['airports_weight']:
+            return 'airports', '/api/v1/airports/', {}, headers
+
+        params = {'page_size': 10}
+        sort_field = rng.choice(SORT_FIELDS)
+        params['sort_field'] = sort_field
+        if sort_field:
+            params['sort_order'] = rng.choice(['asc', 'desc'])
+
+        # Most users stay on the first pages, a few go deep
+        params['page'] = min(options['max_page'], int(rng.paretovariate(1.2)))
+
+        if airport_codes and rng.random() < 0.3:
+            params['departure_airport'] = rng.choice(airport_codes)
+            params['page'] = 1
+        if airport_codes and rng.random() < 0.1:
+            params['arrival_airport'] = rng.choice(airport_codes)
+            params['page'] = 1
+
+        name = 'statistics:filtered' if 'departure_airport' in params or 'arrival_airport' in params \
+            else f"statistics:{sort_field or 'unsorted'}"
+        return name, '/api/v1/airport-statistics/', params, headers
+
+    async def user(self, client, number, start, deadline, airport_codes, results, options):
+        rng = random.Random(number)
+        await asyncio.sleep(options['ramp_up'] * number / options['concurrency'])
+
+        while time.perf_counter() < deadline:
+            name, path, params, headers = self.make_request(rng, airport_codes, options)
+            sent = time.perf_counter()
+            try:
+                response = await client.get(path, params=params, headers=headers)
+                status = response.status_code
+                queries = response.headers.get('X-DB-Query-Count')
+            except httpx.HTTPError:
+                status, queries = None, None
+            received = time.perf_counter()
+
+            results[name].append((sent - start, received - sent, status, queries))
+
+    async def run(self, options):
+        limits = httpx.Limits(max_connections=options['concurrency'])
+        cookies = {'sessionid': options['sessionid']}
+
+        async with httpx.AsyncClient(base_url=options['base_url'], cookies=cookies, limits=limits,
+                                     timeout=30) as client:
+            response = await client.get('/api/v1/airports/')
+            if response.status_code != 200:
+                raise CommandError(f"GET /api/v1/airports/ returned {response.status_code}, check --sessionid")
+            airport_codes = [airport['airport_code'] for airport in response.json()]
+
+            results = defaultdict(list)
+            start = time.perf_counter()
+            deadline = start + options['ramp_up'] + options['duration']
+
+            await asyncio.gather(*(
+                self.user(client, i, start, deadline, airport_codes, results, options)
+                for i in range(options['concurrency'])
+            ))
+
+        return results
+
+    def summarize(self, samples, duration):
+        latencies = sorted(latency for _, latency, _, _ in samples)
+        errors = sum(1 for _, _, status, _ in samples if status != 200)
+        queries = [int(q) for _, _, _, q in samples if q is not None]
+
+        return {
+            'requests': len(samples),
+            'throughput': len(samples) / duration,
+            'p50_ms': percentile(latencies, 0.50) * 1000,
+            'p95_ms': percentile(latencies, 0.95) * 1000,
+            'p99_ms': percentile(latencies, 0.99) * 1000,
+            'error_rate': errors / len(samples) if samples else 0.0,
+            'queries_mean': sum(queries) / len(queries) if queries else None,
+            'queries_max': max(queries) if queries else None,
+        }
+
+    def handle(self, *args, **options):
+        results = asyncio.run(self.run(options))
+
+        # Steady state only: leave the ramp-up out of the numbers
+        steady = {
+            name: [sample for sample in samples if sample[0] >= options['ramp_up']]
+            for name, samples in results.items()
+        }
+        report = {name: self.summarize(samples, options['duration']) for name, samples in sorted(steady.items())}
+        report['total'] = self.summarize(
+            [sample for samples in steady.values() for sample in samples], options['duration']
+        )
+
+        self.stdout.write(f"{'scenario':<32}{'req':>8}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+                          f"{'errors':>9}{'queries':>9}")
+        for name, summary in report.items():
+            queries = '-' if summary['queries_mean'] is None else f"{summary['queries_mean']:.1f}"
+            self.stdout.write(
+                f"{name:<32}{summary['requests']:>8}{summary['throughput']:>9.1f}{summary['p50_ms']:>9.1f}"
+                f"{summary['p95_ms']:>9.1f}{summary['p99_ms']:>9.1f}{summary['error_rate']:>9.2%}{queries:>9}"
+            )
+
+        if options['report']:
+            with open(options['report'], 'w') as f:
+                json.dump({'options': {k: options[k] for k in ('base_url', 'concurrency', 'duration', 'ramp_up')},
+                           'results': report}, f, indent=2)
+
+        self.stdout.write(self.style.SUCCESS('Load test completed!'))
@@ -0,0 +1,250 @@
+import datetime
+
+from django.core.management.base import CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from app.management.base import InstrumentedCommand
+from app.models import BoardingPass, Flight, TicketFlight
+
+# Tables partitioned by the month of scheduled_departure, parents first
+PARTITIONED_MODELS = [Flight, TicketFlight, BoardingPass]
+
+# Tables whose scheduled_departure is a copy of their flight's
+CHILD_MODELS = [TicketFlight, BoardingPass]
+
+
+def month_start(value):
+    return datetime.date(value.year, value.month, 1)
+
+
+def add_months(value, months):
+    month = value.month - 1 + months
+    return datetime.date(value.year + month // 12, month % 12 + 1, 1)
+
+
+def partition_name(table, month):
+    return f"{table}_p{month:%Y_%m}"
+
+
+class Command(InstrumentedCommand):
+    help = ('Backfill the scheduled_departure copies of ticket flights and boarding passes, convert flights, '
+            'ticket flights and boarding passes to monthly partitions and maintain them. In the partitioned '
+            'layout primary keys include scheduled_departure, so the database no longer enforces that a '
+            'flight_id (or ticket flight/boarding pass id) is unique on its own, and foreign keys to flights '
+            'are dropped.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--backfill', action='store_true',
+                            help='Fill missing scheduled_departure copies in batches; needed in either layout')
+        parser.add_argument('--backfill-batch-size', type=int, default=50000)
+        parser.add_argument('--convert', action='store_true',
+                            help='Convert the tables to the partitioned layout (one-off, locks the tables, '
+                                 'loses the uniqueness of flight_id on its own)')
+        parser.add_argument('--create-ahead', type=int, default=3, metavar='MONTHS',
+                            help='Create partitions for this many months after the current one')
+        parser.add_argument('--archive-before', metavar='YYYY-MM',
+                            help='Detach partitions of months before this one and move them to --archive-schema')
+        parser.add_argument('--archive-schema', default='archive')
+
+    def is_partitioned(self, cursor, table):
+        cursor.execute("SELECT 1 FROM pg_partitioned_table WHERE partrelid = %s::regclass", [table])
+        return cursor.fetchone() is not None
+
+    def create_partition(self, cursor, table, month):
+        name = partition_name(table, month)
+        cursor.execute(
+            f'CREATE TABLE IF NOT EXISTS "{name}" PARTITION OF "{table}" '
+            f"FOR VALUES FROM ('{month.isoformat()}') TO ('{add_months(month, 1).isoformat()}')"
+        )
+        return name
+
+    def convert_table(self, cursor, model):
+        table = model._meta.db_table
+        pk = model._meta.pk.column
+
+        self.stdout.write(f"Converting {table}...")
+
+        # Secondary indexes are recreated on the partitioned table; unique ones cannot be
+        # since they would have to include the partition key
+        cursor.execute("""
+            SELECT pg_get_indexdef(i.indexrelid)
+            FROM pg_index i
+            WHERE i.indrelid = %s::regclass AND NOT i.indisunique AND NOT i.indisprimary
+        """, [table])
+        index_definitions = [row[0] for row in cursor.fetchall()]
+
+        # Remaining foreign keys (to airports, aircraft, tickets) are not copied by LIKE either
+        cursor.execute("""
+            SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint
+            WHERE contype = 'f' AND conrelid = %s::regclass
+        """, [table])
+        foreign_keys = cursor.fetchall()
+
+        cursor.execute(f'SELECT min(scheduled_departure), max(scheduled_departure) FROM "{table}"')
+        first, last = cursor.fetchone()
+
+        cursor.execute(
+            f'CREATE TABLE "{table}_partitioned" (LIKE "{table}" INCLUDING DEFAULTS) '
+            f'PARTITION BY RANGE (scheduled_departure)'
+        )
+        cursor.execute(f'CREATE TABLE "{table}_default" PARTITION OF "{table}_partitioned" DEFAULT')
+
+        if first is not None:
+            month = month_start(first)
+            while month <= month_start(last):
+                self.create_partition(cursor, f"{table}_partitioned", month)
+                month = add_months(month, 1)
+
+        cursor.execute(f'INSERT INTO "{table}_partitioned" SELECT * FROM "{table}"')
+        cursor.execute(f'DROP TABLE "{table}"')
+        cursor.execute(f'ALTER TABLE "{table}_partitioned" RENAME TO "{table}"')
+        cursor.execute(f'ALTER TABLE "{table}" ADD PRIMARY KEY ("{pk}", scheduled_departure)')
+
+        # Partitions created above were named after the temporary table
+        cursor.execute("""
+            SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = %s::regclass
+        """, [table])
+        for (name,) in cursor.fetchall():
+            if name.startswith(f"{table}_partitioned"):
+                cursor.execute(f'ALTER TABLE "{name}" RENAME TO "{table}{name[len(table) + len("_partitioned"):]}"')
+
+        for definition in index_definitions:
+            cursor.execute(definition)
+
+        for constraint, definition in foreign_keys:
+            cursor.execute(f'ALTER TABLE "{table}" ADD CONSTRAINT "{constraint}" {definition}')
+
+        # Identity columns are not copied by LIKE; give auto primary keys a sequence again
+        if model._meta.pk.get_internal_type() in ('AutoField', 'BigAutoField'):
+            sequence = f"{table}_{pk}_seq"
+            cursor.execute(f'CREATE SEQUENCE IF NOT EXISTS "{sequence}" OWNED BY "{table}"."{pk}"')
+            cursor.execute(f'SELECT setval(%s, COALESCE((SELECT max("{pk}") FROM "{table}"), 0) + 1, false)',
+                           [sequence])
+            cursor.execute(f'ALTER TABLE "{table}" ALTER COLUMN "{pk}" SET DEFAULT nextval(\'"{sequence}"\')')
+
+    def backfill(self, batch_size):
+        """ Copy the flights' departures onto rows missing them, one committed batch at a time. """
+        flights = Flight._meta.db_table
+
+        for model in CHILD_MODELS:
+            table = model._meta.db_table
+            pk = model._meta.pk.column
+            with self.phase(f'backfill {table}') as phase:
+                phase.rows = 0
+                while True:
+                    with transaction.atomic(), connection.cursor() as cursor:
+                        cursor.execute(f"""
+                            UPDATE "{table}" c SET scheduled_departure = f.scheduled_departure
+                            FROM "{flights}" f
+                            WHERE f.flight_id = c.flight_id AND c."{pk}" IN (
+                                -- Rows of missing flights would be picked again in every batch
+                                SELECT m."{pk}" FROM "{table}" m JOIN "{flights}" mf ON mf.flight_id = m.flight_id
+                                WHERE m.scheduled_departure IS NULL LIMIT %s
+                            )
+                        """, [batch_size])
+                        updated = cursor.rowcount
+                    phase.rows += updated
+                    if updated < batch_size:
+                        break
+                    self.stdout.write(f"  {phase.rows} rows of {table} backfilled...")
+            self.stdout.write(f"Backfilled {phase.rows} rows of {table}")
+
+    def convert(self):
+        flights = Flight._meta.db_table
+
+        with transaction.atomic(), connection.cursor() as cursor:
+            if self.is_partitioned(cursor, flights):
+                raise CommandError(f"{flights} is already partitioned.")
+
+            # Foreign keys to flights cannot be kept: the flight primary key now includes the partition key
+            cursor.execute("""
+                SELECT conrelid::regclass::text, conname FROM pg_constraint
+                WHERE contype = 'f' AND confrelid = %s::regclass
+            """, [flights])
+            for table, constraint in cursor.fetchall():
+                self.stdout.write(f"Dropping foreign key {constraint} on {table}")
+                cursor.execute(f'ALTER TABLE {table} DROP CONSTRAINT "{constraint}"')
+
+            # Rows written since the --backfill batches, under the conversion's locks
+            for model in CHILD_MODELS:
+                table = model._meta.db_table
+                self.stdout.write(f"Backfilling {table}.scheduled_departure...")
+                cursor.execute(f"""
+                    UPDATE "{table}" c SET scheduled_departure = f.scheduled_departure
+                    FROM "{flights}" f
+                    WHERE f.flight_id = c.flight_id AND c.scheduled_departure IS NULL
+                """)
+
+            for model in PARTITIONED_MODELS:
+                self.convert_table(cursor, model)
+
+        self.stdout.write(self.style.SUCCESS("Tables converted to the partitioned layout!"))
+
+    def create_ahead(self, months):
+        current = month_start(timezone.now())
+
+        with connection.cursor() as cursor:
+            for model in PARTITIONED_MODELS:
+                table = model._meta.db_table
+                if not self.is_partitioned(cursor, table):
+                    raise CommandError(f"{table} is not partitioned, run with --convert first.")
+
+                for i in range(months + 1):
+                    name = self.create_partition(cursor, table, add_months(current, i))
+                    self.stdout.write(f"Partition {name} is in place")
+
+    def archive_before(self, value, schema):
+        try:
+            before = datetime.datetime.strptime(value, '%Y-%m').date()
+        except ValueError:
+            raise CommandError("--archive-before must be in YYYY-MM format.")
+
+        with connection.cursor() as cursor:
+            cursor.execute(f'CREATE SCHEMA IF NOT EXISTS "{schema}"')
+
+            for model in PARTITIONED_MODELS:
+                table = model._meta.db_table
+                cursor.execute("""
+                    SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+                    WHERE i.inhparent = %s::regclass
+                """, [table])
+
+                for (name,) in cursor.fetchall():
+                    try:
+                        month = datetime.datetime.strptime(name[len(table):], '_p%Y_%m').date()
+                    except ValueError:
+                        continue  # The default partition
+                    if month >= before:
+                        continue
+
+                    cursor.execute(f'ALTER TABLE "{table}" DETACH PARTITION "{name}"')
+                    cursor.execute(f'ALTER TABLE "{name}" SET SCHEMA "{schema}"')
+                    self.stdout.write(f"Archived {name} to {schema}.{name}")
+
+    def handle(self, *args, **options):
+        # Before the conversion, so that it only has the remainder to fill while holding its locks
+        if options['backfill'] or options['convert']:
+            self.backfill(options['backfill_batch_size'])
+
+        if options['convert']:
+            with self.phase('convert'):
+                self.convert()
+
+        with connection.cursor() as cursor:
+            partitioned = self.is_partitioned(cursor, Flight._meta.db_table)
+        if not partitioned:
+            if options['backfill']:
+                self.stdout.write(self.style.SUCCESS("Backfill completed; the tables are not partitioned."))
+                return
+            raise CommandError(f"{Flight._meta.db_table} is not partitioned, run with --convert first.")
+
+        with self.phase('create ahead'):
+            self.create_ahead(options['create_ahead'])
+
+        if options['archive_before']:
+            with self.phase('archive'):
+                self.archive_before(options['archive_before'], options['archive_schema'])
+
+        self.stdout.write(self.style.SUCCESS("Partition maintenance completed!"))
@@ -1,10 +1,10 @@
 
 import math
 
-from django.core.management.base import BaseCommand
+from app.management.base import InstrumentedCommand
 
 
-class Command(BaseCommand):
+class Command(InstrumentedCommand):
     help = "Sync data from old DB to new DB"
 
     def haversine(self, lat1, lon1, lat2, lon2):
@@ -25,41 +25,47 @@ class Command(BaseCommand):
 
     def handle(self, *args, **options):
 
-        print("Prefetching all airports...")
-        airports = Airport.objects.all()
-        n = len(airports)
-        distances = []
+        with self.phase('prefetch airports'):
+            print("Prefetching all airports...")
+            airports = Airport.objects.all()
+            n = len(airports)
+            distances = []
 
-        print("Calculating distances...")
-        for i in range(n):
-            for j in range(n):
+        with self.phase('calculate distances') as phase:
+            print("Calculating distances...")
+            for i in range(n):
+                for j in range(n):
 
-                if i == j:
-                    continue
+                    if i == j:
+                        continue
 
-                airport1 = airports[i]
-                airport2 = airports[j]
+                    airport1 = airports[i]
+                    airport2 = airports[j]
 
 
-                lat1 = airport1.latitude
-                lon1 = airport1.longitude
+                    lat1 = airport1.latitude
+                    lon1 = airport1.longitude
 
-                lat2 = airport2.latitude
-                lon2 = airport2.longitude
+                    lat2 = airport2.latitude
+                    lon2 = airport2.longitude
 
-                distance = self.haversine(lat1, lon1, lat2, lon2)
+                    distance = self.haversine(lat1, lon1, lat2, lon2)
 
-                # Save the distance to the database
-                distances.append(
-                    AirportDistance(
-                        departure_airport=airport1,
-                        arrival_airport=airport2,
-                        distance_km=distance
+                    # Save the distance to the database
+                    distances.append(
+                        AirportDistance(
+                            departure_airport=airport1,
+                            arrival_airport=airport2,
+                            distance_km=distance
+                        )
                     )
-                )
+
+            phase.rows = len(distances)
 
         # Bulk create distances to optimize database operations
-        print("Bulk creating distances...")
-        AirportDistance.objects.bulk_create(distances)
+        with self.phase('bulk create') as phase:
+            print("Bulk creating distances...")
+            AirportDistance.objects.bulk_create(distances)
+            phase.rows = len(distances)
 
         self.stdout.write(self.style.SUCCESS("Distance calculations are completed!"))
\ No newline at end of file
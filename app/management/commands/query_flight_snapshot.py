@@ -0,0 +1,84 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.serializers.json import DjangoJSONEncoder
+
+from app.snapshot import FlightSnapshot
+
+
+class Command(BaseCommand):
+    help = ('Run an analytical query on the flight snapshot, e.g. '
+            '--where status=Delayed --group-by departure_airport,hour --agg delay=mean:departure_delay')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--where', action='append', default=[], metavar='COLUMN[__LOOKUP]=VALUE',
+                            help='Filter; comma separated values for __in, true/false for __isnull')
+        parser.add_argument('--group-by', default='', help='Comma separated columns')
+        parser.add_argument('--agg', action='append', default=[], metavar='NAME=FUNCTION[:COLUMN]',
+                            help='Aggregate (count, sum, mean, min, max); count of rows by default')
+        parser.add_argument('--order-by', default='', help='Comma separated result keys, - for descending')
+        parser.add_argument('--limit', type=int)
+        parser.add_argument('--json', action='store_true', help='Print the rows as JSON')
+        parser.add_argument('--directory', default=None, help='Snapshot directory (default FLIGHT_SNAPSHOT_DIR)')
+
+    def parse_where(self, items):
+        where = {}
+        for item in items:
+            key, sep, value = item.partition('=')
+            if not sep:
+                raise CommandError(f"Invalid --where {item!r}, expected COLUMN[__LOOKUP]=VALUE")
+            if key.endswith('__in'):
+                value = value.split(',')
+            elif key.endswith('__isnull'):
+                value = value.lower() in ('1', 'true', 'yes')
+            # Numbers compare as numbers, everything else as strings
+            if isinstance(value, list):
+                value = [int(v) if v.lstrip('-').isdigit() else v for v in value]
+            elif isinstance(value, str) and value.lstrip('-').isdigit():
+                value = int(value)
+            where[key] = value
+        return where
+
+    def parse_aggregates(self, items):
+        aggregates = {}
+        for item in items:
+            name, sep, spec = item.partition('=')
+            if not sep:
+                raise CommandError(f"Invalid --agg {item!r}, expected NAME=FUNCTION[:COLUMN]")
+            function, _, column = spec.partition(':')
+            aggregates[name] = (function, column or None)
+        return aggregates
+
+    def handle(self, *args, **options):
+        try:
+            snapshot = FlightSnapshot.open(options['directory'])
+        except FileNotFoundError as e:
+            raise CommandError(e)
+
+        split = lambda value: [item for item in value.split(',') if item]
+        start = time.perf_counter()
+        try:
+            rows = snapshot.query(
+                where=self.parse_where(options['where']),
+                group_by=split(options['group_by']),
+                aggregates=self.parse_aggregates(options['agg']) or None,
+                order_by=split(options['order_by']),
+                limit=options['limit'],
+            )
+        except (KeyError, ValueError) as e:
+            raise CommandError(e)
+        elapsed = time.perf_counter() - start
+
+        if options['json']:
+            self.stdout.write(json.dumps(rows, cls=DjangoJSONEncoder, ensure_ascii=False, indent=2))
+        elif rows:
+            keys = list(rows[0])
+            self.stdout.write('\t'.join(keys))
+            for row in rows:
+                self.stdout.write('\t'.join('' if row[key] is None else str(row[key]) for key in keys))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(rows)} rows in {elapsed * 1000:.1f} ms over {len(snapshot)} flights "
+            f"(snapshot {snapshot.meta['generation']})"
+        ))
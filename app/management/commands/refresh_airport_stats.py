@@ -0,0 +1,94 @@
+from django.conf import settings
+from django.core.management.base import CommandError
+from django.db import connection, transaction
+
+from app.management.base import InstrumentedCommand
+from app.models import Airport, AirportStats, Flight, TicketFlight
+
+
+def get_view_sql():
+    """
+    Route statistics over flights and ticket flights, with the columns of AirportStats.
+    The distance matches calculate_distance() in api.v1.signals.
+    """
+    return f"""
+        WITH passengers AS (
+            SELECT flight_id, count(*) AS passengers
+            FROM "{TicketFlight._meta.db_table}"
+            GROUP BY flight_id
+        ), routes AS (
+            SELECT
+                f.departure_airport_id,
+                f.arrival_airport_id,
+                count(*) AS flights_count,
+                COALESCE(sum(p.passengers), 0) AS passengers_count,
+                avg(f.scheduled_arrival - f.scheduled_departure) AS flight_time
+            FROM "{Flight._meta.db_table}" f
+            LEFT JOIN passengers p ON p.flight_id = f.flight_id
+            GROUP BY f.departure_airport_id, f.arrival_airport_id
+        )
+        SELECT
+            (r.departure_airport_id || '-' || r.arrival_airport_id)::varchar AS flight_id,
+            r.departure_airport_id::varchar(3) AS departure_airport_id,
+            r.arrival_airport_id::varchar(3) AS arrival_airport_id,
+            dep.airport_name AS departure_airport_name,
+            arr.airport_name AS arrival_airport_name,
+            r.flight_time,
+            r.passengers_count::integer AS passengers_count,
+            r.flights_count::integer AS flights_count,
+            COALESCE(ST_Distance(dep.coordinates, arr.coordinates) * 100 / 1000, 0)::double precision AS distance_km
+        FROM routes r
+        JOIN "{Airport._meta.db_table}" dep ON dep.airport_code = r.departure_airport_id
+        JOIN "{Airport._meta.db_table}" arr ON arr.airport_code = r.arrival_airport_id
+    """
+
+
+class Command(InstrumentedCommand):
+    help = 'Create or refresh the airport_stats materialized view (AIRPORT_STATS_BACKEND = "materialized_view")'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--create', action='store_true',
+                            help='Replace the airport_stats table with the materialized view')
+
+    def get_relation_kind(self, cursor, name):
+        cursor.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", [name])
+        row = cursor.fetchone()
+        return row[0] if row else None
+
+    def create(self, cursor, name):
+        kind = self.get_relation_kind(cursor, name)
+        if kind == 'm':
+            raise CommandError(f"{name} is already a materialized view.")
+        if kind is not None:
+            with self.phase('drop table'):
+                cursor.execute(f'DROP TABLE "{name}"')
+
+        with self.phase('create view') as phase:
+            cursor.execute(f'CREATE MATERIALIZED VIEW "{name}" AS {get_view_sql()}')
+            phase.rows = cursor.rowcount
+
+        with self.phase('create indexes'):
+            # Required by REFRESH ... CONCURRENTLY, and backs lookups by route key
+            cursor.execute(f'CREATE UNIQUE INDEX "{name}_flight_id_uniq" ON "{name}" (flight_id)')
+            # Same as AirportStats.Meta.indexes, for the airport filters of the statistics list
+            cursor.execute(f'CREATE INDEX "{name}_route" ON "{name}" (departure_airport_id, arrival_airport_id)')
+
+    def handle(self, *args, **options):
+        # With the table backend the signal receivers write to airport_stats, which would
+        # fail on every write once it is a materialized view
+        if settings.AIRPORT_STATS_BACKEND != 'materialized_view':
+            raise CommandError('Set AIRPORT_STATS_BACKEND = "materialized_view" before using the materialized view.')
+
+        name = AirportStats._meta.db_table
+
+        with transaction.atomic(), connection.cursor() as cursor:
+            if options['create']:
+                self.create(cursor, name)
+            elif self.get_relation_kind(cursor, name) != 'm':
+                raise CommandError(f"{name} is not a materialized view, run with --create first.")
+            else:
+                # Readers keep seeing the previous contents while the view is rebuilt
+                with self.phase('refresh view'):
+                    cursor.execute(f'REFRESH MATERIALIZED VIEW CONCURRENTLY "{name}"')
+
+        self.stdout.write(self.style.SUCCESS('Airport statistics refreshed'))
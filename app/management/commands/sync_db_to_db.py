@@ -1,12 +1,12 @@
 import json
 from decimal import Decimal, getcontext
 
-from django.core.management.base import BaseCommand
-
+from app.management.base import InstrumentedCommand
 from app.models import Aircraft, Airport, BoardingPass, Ticket, Flight, Booking, Seat, TicketFlight
+from app.registry import registry
 from django.db import connections
 
-class Command(BaseCommand):
+class Command(InstrumentedCommand):
     help = "Sync data from old DB to new DB"
 
     def migrate_aircrafts(self):
@@ -76,10 +76,10 @@ class Command(BaseCommand):
                     flight_no=row[1],
                     scheduled_departure=row[2],
                     scheduled_arrival=row[3],
-                    departure_airport=Airport.objects.get(airport_code=row[4]),
-                    arrival_airport=Airport.objects.get(airport_code=row[5]),
+                    departure_airport_id=registry.get_airport(row[4]).airport_code,
+                    arrival_airport_id=registry.get_airport(row[5]).airport_code,
                     status=row[6],
-                    aircraft_code=Aircraft.objects.get(aircraft_code=row[7]),
+                    aircraft_code_id=registry.get_aircraft(row[7]).aircraft_code,
                     actual_departure=row[8],
                     actual_arrival=row[9],
                 )
@@ -130,7 +130,8 @@ class Command(BaseCommand):
                     ticket_no=ticket_map[ticket_no],
                     flight_id=flight_map[flight_id],
                     boarding_no=boarding_no,
-                    seat_no=seat_no
+                    seat_no=seat_no,
+                    scheduled_departure=flight_map[flight_id].scheduled_departure,
                 )
             )
 
@@ -147,12 +148,14 @@ class Command(BaseCommand):
         self.stdout.write(self.style.SUCCESS(
             f"Boarding Pass data migration completed! {len(boarding_pass_objects)} records migrated."))
 
+        return len(boarding_pass_objects)
+
     def migrate_seats(self):
         with connections['demo'].cursor() as cursor:
             cursor.execute("SELECT aircraft_code, seat_no, fare_condition FROM seats")
             for row in cursor.fetchall():
                 Seat.objects.create(
-                    aircraft_code=Aircraft.objects.get(aircraft_code=row[0]),
+                    aircraft_code_id=registry.get_aircraft(row[0]).aircraft_code,
                     seat_no=row[1],
                     fare_condition=row[2]
                 )
@@ -202,7 +205,8 @@ class Command(BaseCommand):
                     ticket_no=ticket_map[ticket_no],
                     flight_id=flight_map[flight_id],
                     fare_condition=fare_conditions,
-                    amount=float(amount)
+                    amount=float(amount),
+                    scheduled_departure=flight_map[flight_id].scheduled_departure,
                 )
             )
 
@@ -220,6 +224,8 @@ class Command(BaseCommand):
         self.stdout.write(self.style.SUCCESS(
             f"Ticket Flights data migration completed! {total_migrated} records migrated, {skipped_count} records skipped."))
 
+        return total_migrated
+
     def migrate_airport_coordinates(self):
         from django.contrib.gis.geos import Point
 
@@ -273,15 +279,22 @@ class Command(BaseCommand):
 
     def handle(self, *args, **kwargs):
 
-        # self.migrate_aircrafts()
-        # self.migrate_airports()
-        # self.migrate_bookings()
-        # self.migrate_tickets()
-        # self.migrate_flights()
-        # self.migrate_seats()
-        # self.migrate_boardpasses()
-        # self.migrate_ticketflights()
-        self.migrate_airport_coordinates()
+        # Each step runs as a named phase; steps returning a row count get a rows/sec figure
+        steps = [
+            # ('aircrafts', self.migrate_aircrafts),
+            # ('airports', self.migrate_airports),
+            # ('bookings', self.migrate_bookings),
+            # ('tickets', self.migrate_tickets),
+            # ('flights', self.migrate_flights),
+            # ('seats', self.migrate_seats),
+            # ('boarding passes', self.migrate_boardpasses),
+            # ('ticket flights', self.migrate_ticketflights),
+            ('airport coordinates', self.migrate_airport_coordinates),
+        ]
+
+        for name, step in steps:
+            with self.phase(name) as phase:
+                phase.rows = step()
 
 
         self.stdout.write(self.style.SUCCESS("Data migration completed!"))
\ No newline at end of file
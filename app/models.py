@@ -1,5 +1,8 @@
 from django.db import models
 from django.contrib.gis.db import models as gis_models
+from django.contrib.postgres.indexes import GinIndex
+from django.db.models import Value
+from django.db.models.functions import Replace, Upper
 
 
 class Aircraft(models.Model):
@@ -58,8 +61,22 @@ class Flight(models.Model):
             models.Index(fields=['departure_airport', 'arrival_airport']),
             models.Index(fields=['departure_airport_id']),
             models.Index(fields=['arrival_airport_id']),
+            # Departures/arrivals boards: one airport, a range of scheduled times
+            models.Index(fields=['departure_airport', 'scheduled_departure', 'flight_id'], name='flight_departure_board'),
+            models.Index(fields=['arrival_airport', 'scheduled_arrival', 'flight_id'], name='flight_arrival_board'),
         ]
 
+    # Marks an instance whose scheduled_departure was not loaded from the database
+    NOT_LOADED = object()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Departure as loaded, so that saves can tell a reschedule (see api.v1.signals.sync_copied_departures)
+        if 'scheduled_departure' in field_names:
+            instance._loaded_scheduled_departure = instance.scheduled_departure
+        return instance
+
     def __str__(self):
         return f"Flight {self.flight_no} from {self.departure_airport} to {self.arrival_airport}"
 
@@ -70,6 +87,9 @@ class BoardingPass(models.Model):
     boarding_no = models.IntegerField()
     seat_no = models.CharField(max_length=4)
 
+    # Copy of the flight's scheduled departure, the partition key in the partitioned layout
+    scheduled_departure = models.DateTimeField(null=True, blank=True, editable=False)
+
     def __str__(self):
         return f"BP: {self.boarding_no}. Flight: {self.flight_id}, Seat: {self.seat_no}"
 
@@ -96,6 +116,11 @@ class Seat(models.Model):
         return f"Seat {self.seat_no} ({self.fare_condition})"
 
 
+def normalized_passenger_id():
+    """ Passenger document number upper-cased and without spaces, as indexed by ticket_passenger_id_norm. """
+    return Replace(Upper('passenger_id'), Value(' '), Value(''))
+
+
 class Ticket(models.Model):
     ticket_no = models.CharField(max_length=13, primary_key=True, db_index=True)
     book_ref = models.ForeignKey(Booking, on_delete=models.CASCADE)
@@ -103,6 +128,16 @@ class Ticket(models.Model):
     passenger_name = models.TextField()
     contact_data = models.JSONField()
 
+    class Meta:
+        indexes = [
+            # Trigram index for fuzzy and prefix search on passenger names (needs pg_trgm)
+            GinIndex(fields=['passenger_name'], opclasses=['gin_trgm_ops'], name='ticket_passenger_name_trgm'),
+            # Containment lookups on e-mail/phone inside contact_data
+            GinIndex(fields=['contact_data'], name='ticket_contact_data_gin'),
+            # Document number lookups
+            models.Index(normalized_passenger_id(), name='ticket_passenger_id_norm'),
+        ]
+
     def __str__(self):
         return f"Ticket: {self.ticket_no}, Passenger: {self.passenger_name}"
 
@@ -113,6 +148,9 @@ class TicketFlight(models.Model):
     fare_condition = models.CharField(max_length=10, choices=Seat.FareConditionChoices)
     amount = models.DecimalField(max_digits=10, decimal_places=2)
 
+    # Copy of the flight's scheduled departure, the partition key in the partitioned layout
+    scheduled_departure = models.DateTimeField(null=True, blank=True, editable=False)
+
     class Meta:
         indexes = [
             # Composite index for faster joins and filtering
@@ -138,4 +176,28 @@ class AirportStats(models.Model):
     distance_km = models.FloatField()
 
     class Meta:
-        db_table = 'airport_stats'
\ No newline at end of file
+        db_table = 'airport_stats'
+        indexes = [
+            # departure_airport/arrival_airport filters of the statistics list
+            models.Index(fields=['departure_airport_id', 'arrival_airport_id'], name='airport_stats_route'),
+        ]
+
+
+class AirportNetworkStats(models.Model):
+    """ Route network metrics of an airport, computed by the compute_network_stats command. """
+    airport = models.OneToOneField(Airport, on_delete=models.CASCADE, primary_key=True, db_column='airport_code')
+
+    out_degree = models.IntegerField()
+    in_degree = models.IntegerField()
+    flights_count = models.IntegerField()
+    passengers_count = models.IntegerField()
+
+    # Airport pairs without a direct route that connect through this airport
+    transfer_pairs = models.IntegerField()
+    # Airports reachable from this one with at most one connection
+    two_hop_reach = models.IntegerField()
+
+    computed_at = models.DateTimeField()
+
+    class Meta:
+        db_table = 'airport_network_stats'
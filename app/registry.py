@@ -0,0 +1,129 @@
+"""
+Process-wide registry of reference data.
+
+Airports and aircraft are a few hundred rows that almost never change, but are
+needed for every flight saved or imported. The registry loads them once into
+slotted records, always from the primary database, and is invalidated by the
+post_save/post_delete receivers in `api.v1.signals` once the change commits. A
+load that raced with an invalidation is used but not kept. Invalidation is per
+process: there is no cross-process notification, so other workers keep their
+copy until it is older than REFERENCE_REGISTRY_TTL seconds or they restart.
+"""
+import itertools
+import threading
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+from app.models import Aircraft, Airport
+
+
+class AirportRecord:
+    __slots__ = ('airport_code', 'airport_name', 'city', 'longitude', 'latitude', 'timezone')
+
+    def __init__(self, airport_code, airport_name, city, coordinates, timezone):
+        self.airport_code = airport_code
+        self.airport_name = airport_name
+        self.city = city
+        self.longitude = coordinates.x if coordinates else None
+        self.latitude = coordinates.y if coordinates else None
+        self.timezone = timezone
+
+    @property
+    def has_coordinates(self):
+        return self.longitude is not None and self.latitude is not None
+
+    def name(self, lang):
+        return self.airport_name.get(lang)
+
+    def city_name(self, lang):
+        return self.city.get(lang)
+
+    def __repr__(self):
+        return f"<AirportRecord {self.airport_code}>"
+
+
+class AircraftRecord:
+    __slots__ = ('aircraft_code', 'model', 'range')
+
+    def __init__(self, aircraft_code, model, range):
+        self.aircraft_code = aircraft_code
+        self.model = model
+        self.range = range
+
+    def __repr__(self):
+        return f"<AircraftRecord {self.aircraft_code}>"
+
+
+class ReferenceRegistry:
+    """ Lazily loaded, in-memory copy of the Airport and Aircraft tables. """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # (records, loaded at) or None
+        self._airports = None
+        self._aircraft = None
+        # Attribute -> generation, replaced on every invalidation of it
+        self._counter = itertools.count(1)
+        self._generations = {'_airports': 0, '_aircraft': 0}
+
+    # Replicas may lag behind the change that invalidated the registry
+    def _load_airports(self):
+        rows = Airport.objects.using(DEFAULT_DB_ALIAS).values_list(
+            'airport_code', 'airport_name', 'city', 'coordinates', 'timezone',
+        )
+        return {row[0]: AirportRecord(*row) for row in rows}
+
+    def _load_aircraft(self):
+        rows = Aircraft.objects.using(DEFAULT_DB_ALIAS).values_list('aircraft_code', 'model', 'range')
+        return {row[0]: AircraftRecord(*row) for row in rows}
+
+    def _is_fresh(self, entry):
+        return entry is not None and time.monotonic() - entry[1] <= settings.REFERENCE_REGISTRY_TTL
+
+    def _get(self, attr, load):
+        entry = getattr(self, attr)
+        if not self._is_fresh(entry):
+            with self._lock:
+                entry = getattr(self, attr)
+                if not self._is_fresh(entry):
+                    generation = self._generations[attr]
+                    entry = (load(), time.monotonic())
+                    # Not kept if invalidated meanwhile: the load may predate the change
+                    if self._generations[attr] == generation:
+                        setattr(self, attr, entry)
+        return entry[0]
+
+    @property
+    def airports(self):
+        return self._get('_airports', self._load_airports)
+
+    @property
+    def aircraft(self):
+        return self._get('_aircraft', self._load_aircraft)
+
+    def get_airport(self, airport_code):
+        try:
+            return self.airports[airport_code]
+        except KeyError:
+            raise Airport.DoesNotExist(f"Airport {airport_code} does not exist.")
+
+    def get_aircraft(self, aircraft_code):
+        try:
+            return self.aircraft[aircraft_code]
+        except KeyError:
+            raise Aircraft.DoesNotExist(f"Aircraft {aircraft_code} does not exist.")
+
+    def _invalidate(self, attr):
+        self._generations[attr] = next(self._counter)
+        setattr(self, attr, None)
+
+    def invalidate_airports(self):
+        self._invalidate('_airports')
+
+    def invalidate_aircraft(self):
+        self._invalidate('_aircraft')
+
+
+registry = ReferenceRegistry()
@@ -0,0 +1,99 @@
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DatabaseError, connections
+
+# Whether reads in the current context may go to a replica, see read_from_replica()
+_replica_reads = ContextVar('replica_reads', default=False)
+
+# Set once the current context has written to the primary; later reads stay on it
+_pinned_to_primary = ContextVar('pinned_to_primary', default=False)
+
+# Replica alias -> (checked at, lag in seconds)
+_replica_lag = {}
+
+# Models whose reads may be served by a replica: the read-only statistics, where a
+# bounded lag is harmless. Sessions, auth and everything else always read from `default`
+REPLICA_MODELS = {'app.Airport', 'app.AirportStats', 'app.AirportNetworkStats'}
+
+LAG_QUERY = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+"""
+
+
+@contextmanager
+def read_from_replica():
+    """
+    Allow reads inside the block to be served by a replica.
+
+    Used around read-only API requests. Writes always go to `default`, and any
+    write inside the block pins the following reads to `default` as well.
+    """
+    replica_token = _replica_reads.set(True)
+    pinned_token = _pinned_to_primary.set(False)
+    try:
+        yield
+    finally:
+        _pinned_to_primary.reset(pinned_token)
+        _replica_reads.reset(replica_token)
+
+
+def get_replica_lag(alias):
+    """
+    Return the replication lag of a replica in seconds, checking it at most once
+    per REPLICA_LAG_CHECK_INTERVAL. An unreachable replica has infinite lag.
+    """
+    now = time.monotonic()
+    checked_at, lag = _replica_lag.get(alias, (None, None))
+
+    if checked_at is None or now - checked_at > settings.REPLICA_LAG_CHECK_INTERVAL:
+        try:
+            with connections[alias].cursor() as cursor:
+                cursor.execute(LAG_QUERY)
+                lag = float(cursor.fetchone()[0])
+        except DatabaseError:
+            lag = float('inf')
+        _replica_lag[alias] = (now, lag)
+
+    return lag
+
+
+class ReplicaRouter:
+    """
+    Database router sending reads of REPLICA_MODELS made inside read_from_replica()
+    to one of the DATABASE_REPLICAS whose lag is below REPLICA_MAX_LAG_SECONDS, and
+    everything else (other models, writes, signal handlers, management commands)
+    to `default`.
+    """
+
+    def db_for_read(self, model, **hints):
+        if not _replica_reads.get() or _pinned_to_primary.get() or model._meta.label not in REPLICA_MODELS:
+            return None
+
+        replicas = [
+            alias for alias in settings.DATABASE_REPLICAS
+            if get_replica_lag(alias) <= settings.REPLICA_MAX_LAG_SECONDS
+        ]
+        if not replicas:
+            return None  # Fall back to the primary
+
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        if _replica_reads.get():
+            _pinned_to_primary.set(True)
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
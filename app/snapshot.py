@@ -0,0 +1,298 @@
+"""
+Columnar snapshot of the flights table for ad-hoc analytics off the database.
+
+The export_flight_snapshot command writes one .npy file per column into a new
+generation directory and names it in the `current` pointer file. String columns
+are dictionary-encoded as int32 codes into append-only dictionaries, so codes
+stay valid across incremental refreshes. FlightSnapshot memory-maps the
+current generation and answers queries with vectorized NumPy operations:
+
+    snapshot = FlightSnapshot.open()
+    snapshot.query(
+        where={'status': 'Delayed', 'scheduled_departure__gte': datetime.datetime(2017, 8, 1)},
+        group_by=['departure_airport', 'hour'],
+        aggregates={'flights': ('count', None), 'avg_delay': ('mean', 'departure_delay')},
+        order_by=['-flights'], limit=10,
+    )
+"""
+import datetime
+import json
+import os
+import shutil
+import time
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+
+# Column -> kind; 'dictionary' columns hold codes into meta['dictionaries'][column]
+COLUMNS = {
+    'flight_id': 'int',
+    'flight_no': 'dictionary',
+    'route': 'dictionary',
+    'departure_airport': 'dictionary',
+    'arrival_airport': 'dictionary',
+    'aircraft_code': 'dictionary',
+    'status': 'dictionary',
+    'scheduled_departure': 'datetime',
+    'scheduled_arrival': 'datetime',
+    'actual_departure': 'datetime',
+    'actual_arrival': 'datetime',
+    'passenger_count': 'int',
+}
+
+DTYPES = {'int': np.int64, 'dictionary': np.int32, 'datetime': 'datetime64[s]'}
+
+LOOKUPS = ('exact', 'in', 'gt', 'gte', 'lt', 'lte', 'isnull')
+
+AGGREGATES = ('count', 'sum', 'mean', 'min', 'max')
+
+
+def _seconds(delta):
+    """ timedelta64 array -> float seconds, NaN where either side was NaT. """
+    return np.where(np.isnat(delta), np.nan, delta.astype('timedelta64[s]').astype(np.float64))
+
+
+# Derived column -> (kind, function of the snapshot returning the array)
+DERIVED = {
+    # UTC hour, weekday (Monday = 0), date and month of the scheduled departure
+    'hour': ('int', lambda s: (s['scheduled_departure'].astype(np.int64) // 3600) % 24),
+    'weekday': ('int', lambda s: (s['scheduled_departure'].astype('datetime64[D]').astype(np.int64) + 3) % 7),
+    'date': ('date', lambda s: s['scheduled_departure'].astype('datetime64[D]')),
+    'month': ('month', lambda s: s['scheduled_departure'].astype('datetime64[M]')),
+    # Seconds; NaN for flights that have not departed/arrived
+    'departure_delay': ('float', lambda s: _seconds(s['actual_departure'] - s['scheduled_departure'])),
+    'arrival_delay': ('float', lambda s: _seconds(s['actual_arrival'] - s['scheduled_arrival'])),
+    'flight_time': ('float', lambda s: _seconds(s['scheduled_arrival'] - s['scheduled_departure'])),
+}
+
+
+def get_snapshot_dir():
+    return Path(settings.FLIGHT_SNAPSHOT_DIR)
+
+
+def to_datetime64(value):
+    """ Aware or naive (UTC) datetime, date or ISO string (e.g. '2017-08' for a month) -> numpy datetime64. """
+    if isinstance(value, str):
+        try:
+            value = datetime.datetime.fromisoformat(value)
+        except ValueError:
+            return np.datetime64(value)
+    if isinstance(value, datetime.datetime) and value.tzinfo is not None:
+        value = value.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    return np.datetime64(value)
+
+
+class FlightSnapshot:
+    """ Read-only, memory-mapped view of one snapshot generation. """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.meta = json.loads((self.path / 'meta.json').read_text())
+        self.dictionaries = self.meta['dictionaries']
+        self.columns = {
+            name: np.load(self.path / f"{name}.npy", mmap_mode='r') for name in COLUMNS
+        }
+        self.derived = {}
+        self.codes = {}
+
+    @classmethod
+    def open(cls, directory=None):
+        current = Path(directory or get_snapshot_dir()) / 'current'
+        if not current.exists():
+            raise FileNotFoundError(f"No flight snapshot in {current.parent}, run export_flight_snapshot first.")
+        return cls(current.parent / current.read_text().strip())
+
+    def __len__(self):
+        return self.meta['rows']
+
+    def __getitem__(self, name):
+        if name in self.columns:
+            return self.columns[name]
+        if name not in DERIVED:
+            raise KeyError(f"Unknown column {name!r}")
+        if name not in self.derived:
+            self.derived[name] = DERIVED[name][1](self)
+        return self.derived[name]
+
+    def kind(self, name):
+        return COLUMNS[name] if name in COLUMNS else DERIVED[name][0]
+
+    def code(self, name, value):
+        """ Code of `value` in the dictionary of `name`, -1 if it does not occur. """
+        if name not in self.codes:
+            self.codes[name] = {value: i for i, value in enumerate(self.dictionaries[name])}
+        return self.codes[name].get(value, -1)
+
+    # Filtering
+
+    def coerce(self, name, value):
+        kind = self.kind(name)
+        if kind == 'dictionary':
+            return self.code(name, value)
+        if kind in ('datetime', 'date', 'month'):
+            return to_datetime64(value).astype(self[name].dtype)
+        return value
+
+    def mask(self, where):
+        mask = np.ones(len(self), dtype=bool)
+        for key, value in (where or {}).items():
+            name, _, lookup = key.partition('__')
+            lookup = lookup or 'exact'
+            if lookup not in LOOKUPS:
+                raise ValueError(f"Unknown lookup {lookup!r}, expected one of {', '.join(LOOKUPS)}")
+
+            column = self[name]
+            if lookup == 'isnull':
+                nulls = np.isnat(column) if column.dtype.kind == 'M' else np.isnan(column) \
+                    if column.dtype.kind == 'f' else np.zeros(len(self), dtype=bool)
+                mask &= nulls if value else ~nulls
+            elif lookup == 'in':
+                mask &= np.isin(column, [self.coerce(name, item) for item in value])
+            elif lookup == 'exact':
+                mask &= column == self.coerce(name, value)
+            else:
+                if self.kind(name) == 'dictionary':
+                    raise ValueError(f"{name} only supports exact, in and isnull lookups")
+                compare = {'gt': np.greater, 'gte': np.greater_equal, 'lt': np.less, 'lte': np.less_equal}[lookup]
+                mask &= compare(column, self.coerce(name, value))
+        return mask
+
+    # Grouping
+
+    def group_codes(self, name, mask):
+        """ (codes of the selected rows, decoded values per code) for a group-by column. """
+        values = self[name][mask]
+        if self.kind(name) == 'dictionary':
+            codes, inverse = np.unique(values, return_inverse=True)
+            return inverse, [self.dictionaries[name][code] for code in codes]
+
+        uniques, inverse = np.unique(values, return_inverse=True)
+        return inverse, [self.decode(name, value) for value in uniques]
+
+    def decode(self, name, value):
+        kind = self.kind(name)
+        if kind in ('datetime', 'date', 'month'):
+            if np.isnat(value):
+                return None
+            if kind == 'month':
+                return str(value)
+            if kind == 'date':
+                return value.item()
+            return value.item().replace(tzinfo=datetime.timezone.utc)
+        if kind == 'float':
+            return None if np.isnan(value) else float(value)
+        return int(value)
+
+    def numeric(self, name, mask):
+        """ Selected values of `name` as float64 with NaN for nulls, and whether they are datetimes. """
+        values = self[name][mask]
+        if values.dtype.kind == 'M':
+            return np.where(np.isnat(values), np.nan, values.astype(np.int64).astype(np.float64)), True
+        if self.kind(name) == 'dictionary':
+            raise ValueError(f"Cannot aggregate the dictionary-encoded column {name}")
+        return values.astype(np.float64), False
+
+    def aggregate(self, function, name, inverse, groups, mask):
+        if function not in AGGREGATES:
+            raise ValueError(f"Unknown aggregate {function!r}, expected one of {', '.join(AGGREGATES)}")
+
+        if name is None:
+            if function != 'count':
+                raise ValueError(f"{function} needs a column")
+            return np.bincount(inverse, minlength=groups), False
+
+        values, is_datetime = self.numeric(name, mask)
+        present = ~np.isnan(values)
+        inverse, values = inverse[present], values[present]
+        counts = np.bincount(inverse, minlength=groups)
+
+        if function == 'count':
+            return counts, False
+        if function == 'sum':
+            sums = np.bincount(inverse, weights=values, minlength=groups)
+            return (sums.round().astype(np.int64) if self.kind(name) == 'int' else sums), False
+        if function == 'mean':
+            return np.bincount(inverse, weights=values, minlength=groups) / np.where(counts, counts, np.nan), False
+
+        ufunc, initial = (np.minimum, np.inf) if function == 'min' else (np.maximum, -np.inf)
+        result = np.full(groups, initial)
+        ufunc.at(result, inverse, values)
+        result[counts == 0] = np.nan
+        return result, is_datetime
+
+    def query(self, where=None, group_by=(), aggregates=None, order_by=(), limit=None):
+        """
+        Filter with Django-style `where` lookups (exact, in, gt, gte, lt, lte, isnull), group by
+        columns and compute `aggregates` ({name: (function, column or None)}, functions being
+        count, sum, mean, min and max). Returns a list of dicts, one per group.
+        """
+        aggregates = aggregates or {'count': ('count', None)}
+        mask = self.mask(where)
+
+        if group_by:
+            codes, keys = zip(*(self.group_codes(name, mask) for name in group_by))
+            sizes = [max(len(values), 1) for values in keys]
+            combined = np.ravel_multi_index(codes, sizes) if codes[0].size else np.empty(0, dtype=np.intp)
+            present, inverse = np.unique(combined, return_inverse=True)
+            group_keys = np.unravel_index(present, sizes)
+        else:
+            # A single group, which exists even when no row matched (count 0)
+            keys, group_keys = [], []
+            present = [0]
+            inverse = np.zeros(int(mask.sum()), dtype=np.intp)
+
+        groups = len(present)
+        results = {}
+        for result_name, (function, name) in aggregates.items():
+            results[result_name] = self.aggregate(function, name, inverse, groups, mask)
+
+        rows = []
+        for i in range(groups):
+            row = {name: keys[k][group_keys[k][i]] for k, name in enumerate(group_by)}
+            for result_name, (values, is_datetime) in results.items():
+                value = values[i]
+                if values.dtype.kind == 'i':
+                    row[result_name] = int(value)
+                elif np.isnan(value):
+                    row[result_name] = None
+                elif is_datetime:
+                    row[result_name] = datetime.datetime.fromtimestamp(value, datetime.timezone.utc)
+                else:
+                    row[result_name] = float(value)
+            rows.append(row)
+
+        # Stable sorts from the last key to the first; nulls last in either direction
+        for key in reversed(order_by):
+            name = key.lstrip('-')
+            rows.sort(key=lambda row: (row[name] is not None, row[name]) if key.startswith('-')
+                      else (row[name] is None, row[name]), reverse=key.startswith('-'))
+
+        return rows[:limit] if limit is not None else rows
+
+
+def write_snapshot(directory, arrays, meta):
+    """
+    Write `arrays` (column -> array) and `meta` as a new generation and make it current.
+    Readers keep their memory maps of the previous generation, which is then removed.
+    """
+    directory = Path(directory)
+    generation = f"{time.strftime('%Y%m%d%H%M%S')}-{os.getpid()}"
+    path = directory / generation
+    path.mkdir(parents=True)
+
+    for name, values in arrays.items():
+        np.save(path / f"{name}.npy", np.ascontiguousarray(values))
+    (path / 'meta.json').write_text(json.dumps({**meta, 'generation': generation}, ensure_ascii=False))
+
+    # Atomic switch: replace the pointer file with one naming the new generation
+    pointer = directory / 'current'
+    tmp_pointer = directory / f".current-{generation}"
+    tmp_pointer.write_text(generation)
+    os.replace(tmp_pointer, pointer)
+
+    for old in directory.iterdir():
+        if old.is_dir() and old.name != generation:
+            shutil.rmtree(old, ignore_errors=True)
+
+    return path
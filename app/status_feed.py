@@ -0,0 +1,239 @@
+"""
+Batched ingestion of flight status updates.
+
+A batch of updates is applied with one bulk UPDATE of the changed flights. Only
+updates touching statistics-relevant fields (route and schedule) are turned into
+per-route deltas for AirportStats; status and actual times never are, so the bulk
+of a status feed costs no statistics work at all. Signals are not sent.
+"""
+import datetime
+from collections import defaultdict
+
+from django.db import connection, transaction
+
+from api.v1.signals import FLIGHT_STATS_FIELDS, calculate_distance, maintains_stats_table, update_copied_departures
+from app.models import AirportStats, Flight
+from app.registry import registry
+
+# Fields an update may set, in Flight field order
+UPDATE_FIELDS = ('departure_airport', 'arrival_airport', 'scheduled_departure', 'scheduled_arrival',
+                 'status', 'actual_departure', 'actual_arrival')
+
+# Updated fields AirportStats depends on
+STATS_FIELDS = FLIGHT_STATS_FIELDS.intersection(UPDATE_FIELDS)
+
+STATUSES = set(Flight.FlightStatusChoices.values)
+
+MAX_BATCH_SIZE = 10000
+
+
+def parse_datetime(value, nullable):
+    if value is None:
+        if nullable:
+            return None
+        raise ValueError("may not be null")
+    try:
+        value = datetime.datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"expected an ISO 8601 datetime, got {value!r}")
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=datetime.timezone.utc)
+    return value
+
+
+def clean_update(record):
+    """ Validate one update, {'flight_id': ..., <some of UPDATE_FIELDS>}. Raises ValueError. """
+    if not isinstance(record, dict):
+        raise ValueError("expected an object")
+
+    unknown = record.keys() - {'flight_id', *UPDATE_FIELDS}
+    if unknown:
+        raise ValueError(f"unknown fields: {', '.join(sorted(unknown))}")
+
+    try:
+        update = {'flight_id': int(record['flight_id'])}
+    except KeyError:
+        raise ValueError("flight_id is required")
+    except (TypeError, ValueError):
+        raise ValueError(f"invalid flight_id {record['flight_id']!r}")
+
+    for name in ('departure_airport', 'arrival_airport', 'status'):
+        if name in record and not isinstance(record[name], str):
+            raise ValueError(f"{name}: expected a string, got {type(record[name]).__name__}")
+
+    for name in ('departure_airport', 'arrival_airport'):
+        if name in record:
+            if record[name] not in registry.airports:
+                raise ValueError(f"unknown {name} {record[name]!r}")
+            update[name] = record[name]
+
+    if 'status' in record:
+        if record['status'] not in STATUSES:
+            raise ValueError(f"invalid status {record['status']!r}")
+        update['status'] = record['status']
+
+    for name in ('scheduled_departure', 'scheduled_arrival', 'actual_departure', 'actual_arrival'):
+        if name in record:
+            try:
+                update[name] = parse_datetime(record[name], nullable=name.startswith('actual'))
+            except ValueError as e:
+                raise ValueError(f"{name}: {e}")
+
+    return update
+
+
+def route_key(flight):
+    return f"{flight['departure_airport']}-{flight['arrival_airport']}"
+
+
+def flight_seconds(flight):
+    return (flight['scheduled_arrival'] - flight['scheduled_departure']).total_seconds()
+
+
+def apply_status_updates(updates):
+    """
+    Apply cleaned updates (later ones win for the same flight) in one transaction.
+    Returns counts of the received, updated, unchanged and unknown flights and of the
+    routes whose statistics changed.
+    """
+    merged = {}
+    for update in updates:
+        merged.setdefault(update['flight_id'], {}).update(update)
+
+    with transaction.atomic():
+        # Lock the flights, in pk order to avoid deadlocks between concurrent batches, so the
+        # stats deltas are computed from the state this transaction overwrites
+        current = {
+            row['flight_id']: row
+            for row in Flight.objects.filter(flight_id__in=merged).select_for_update().order_by('pk').values(
+                'flight_id', 'passenger_count', 'departure_airport_id', 'arrival_airport_id', 'scheduled_departure',
+                'scheduled_arrival', 'status', 'actual_departure', 'actual_arrival',
+            )
+        }
+        for row in current.values():
+            row['departure_airport'] = row.pop('departure_airport_id')
+            row['arrival_airport'] = row.pop('arrival_airport_id')
+
+        changed = []
+        stats_changes = []
+        for flight_id, update in merged.items():
+            old = current.get(flight_id)
+            if old is None:
+                continue
+            new = {**old, **update}
+            fields = {name for name in UPDATE_FIELDS if new[name] != old[name]}
+            if fields:
+                changed.append(new)
+            if fields & STATS_FIELDS:
+                stats_changes.append((old, new))
+
+        if changed:
+            update_flights(changed)
+
+        rescheduled = [new['flight_id'] for old, new in stats_changes
+                       if new['scheduled_departure'] != old['scheduled_departure']]
+        if rescheduled:
+            update_copied_departures(rescheduled)
+
+        routes = 0
+        if stats_changes and maintains_stats_table():
+            routes = update_route_stats(stats_changes)
+
+    return {
+        'received': len(updates),
+        'updated': len(changed),
+        'unchanged': len(current) - len(changed),
+        'unknown': len(merged) - len(current),
+        'routes': routes,
+    }
+
+
+def update_flights(rows):
+    """ One UPDATE for all rows, passing each column as an array parameter. """
+    table = Flight._meta.db_table
+    columns = ['flight_id', *UPDATE_FIELDS]
+    # Flight field name -> column name
+    db_columns = {name: Flight._meta.get_field(name).column for name in columns}
+    types = {
+        'flight_id': 'integer', 'departure_airport': 'varchar',
+        'arrival_airport': 'varchar', 'status': 'varchar', 'scheduled_departure': 'timestamptz',
+        'scheduled_arrival': 'timestamptz', 'actual_departure': 'timestamptz', 'actual_arrival': 'timestamptz',
+    }
+
+    assignments = ', '.join(f'"{db_columns[name]}" = v."{name}"' for name in UPDATE_FIELDS)
+    arrays = ', '.join(f'%s::{types[name]}[]' for name in columns)
+    names = ', '.join(f'"{name}"' for name in columns)
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'UPDATE "{table}" f SET {assignments} '
+            f'FROM unnest({arrays}) AS v({names}) '
+            f'WHERE f.flight_id = v.flight_id',
+            [[row[name] for row in rows] for name in columns],
+        )
+
+
+def update_route_stats(stats_changes):
+    """
+    Move flights between routes and re-weigh the average flight times, with one
+    aggregated delta per route. Returns the number of routes changed.
+    """
+    # Route key -> [flights, passengers, flight time seconds]
+    deltas = defaultdict(lambda: [0, 0, 0.0])
+    first_flights = {}
+    for old, new in stats_changes:
+        for flight, sign in ((old, -1), (new, 1)):
+            delta = deltas[route_key(flight)]
+            delta[0] += sign
+            delta[1] += sign * flight['passenger_count']
+            delta[2] += sign * flight_seconds(flight)
+        first_flights.setdefault(route_key(new), new)
+
+    # Routes whose moves cancel out need no update
+    deltas = {key: delta for key, delta in deltas.items() if any(delta)}
+    if not deltas:
+        return 0
+
+    keys = list(deltas)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            UPDATE "{AirportStats._meta.db_table}" s SET
+                flight_time = CASE WHEN s.flights_count + v.flights > 0
+                    THEN (s.flight_time * s.flights_count + v.seconds * interval '1 second') / (s.flights_count + v.flights)
+                    ELSE interval '0' END,
+                flights_count = greatest(s.flights_count + v.flights, 0),
+                passengers_count = greatest(s.passengers_count + v.passengers, 0)
+            FROM unnest(%s::varchar[], %s::integer[], %s::integer[], %s::double precision[])
+                AS v(flight_id, flights, passengers, seconds)
+            WHERE s.flight_id = v.flight_id
+            RETURNING s.flight_id
+            """,
+            [keys, [deltas[key][0] for key in keys], [deltas[key][1] for key in keys],
+             [deltas[key][2] for key in keys]],
+        )
+        existing = {row[0] for row in cursor.fetchall()}
+
+    # Routes flown for the first time, as update_airport_stats_for_flight would create them
+    new_stats = []
+    for key in deltas.keys() - existing:
+        flights, passengers, seconds = deltas[key]
+        if flights <= 0:
+            continue
+        flight = first_flights[key]
+        departure_airport = registry.get_airport(flight['departure_airport'])
+        arrival_airport = registry.get_airport(flight['arrival_airport'])
+        new_stats.append(AirportStats(
+            flight_id=key,
+            departure_airport_name=departure_airport.airport_name,
+            arrival_airport_name=arrival_airport.airport_name,
+            departure_airport_id=flight['departure_airport'],
+            arrival_airport_id=flight['arrival_airport'],
+            distance_km=calculate_distance(departure_airport, arrival_airport),
+            flights_count=flights,
+            passengers_count=passengers,
+            flight_time=datetime.timedelta(seconds=seconds / flights),
+        ))
+    AirportStats.objects.bulk_create(new_stats)
+
+    return len(existing) + len(new_stats)
@@ -0,0 +1,316 @@
+"""
+Query-count and query-plan regression tests for the hot endpoints, signal
+receivers and commands.
+
+Every check runs on a generated dataset and is compared with the baseline in
+query_baselines.json: the exact number of queries, on every database, and the
+normalized EXPLAIN plan of each query, failing with a unified plan diff when
+it changes. Independently of the baseline, REQUIRED_INDEXES lists indexes that
+must appear in the plans of a check's queries; these are explained with
+sequential scans disabled, so they assert that the index can serve the query
+whatever the size of the dataset.
+
+Record the baseline (and re-record it after an intended change) against a
+PostgreSQL server with PostGIS and commit it with:
+
+    UPDATE_QUERY_BASELINES=1 python manage.py test app.tests.test_query_plans
+
+A check without a recorded baseline still runs its index assertions and is
+then skipped, so an unrecorded baseline never passes as a pinned one.
+"""
+import datetime
+import difflib
+import io
+import json
+import os
+import random
+from contextlib import ExitStack, redirect_stdout
+from decimal import Decimal
+from pathlib import Path
+from zoneinfo import ZoneInfo
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connections
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from api.v1.views import AirportListAPIView, AirportStatisticsAPIView, FlightBoardAPIView, PassengerSearchAPIView
+from app.models import Aircraft, Airport, AirportStats, Booking, Flight, Seat, Ticket, TicketFlight
+from app.registry import registry
+
+BASELINE_PATH = Path(__file__).with_name('query_baselines.json')
+
+UPDATE_BASELINES = os.environ.get('UPDATE_QUERY_BASELINES') == '1'
+
+FLIGHTS_COUNT = 5000
+
+STATS_SORT_FIELDS = ['', 'departure_airport_id', 'arrival_airport_id', 'distance_km', 'flights_count',
+                     'passengers_count', 'flight_time']
+
+# Plan node keys kept for comparison; costs and row estimates vary between runs
+PLAN_KEYS = ('Node Type', 'Strategy', 'Join Type', 'Relation Name', 'Index Name', 'Sort Key', 'Group Key')
+
+# Check name -> indexes that must appear in the plans of its queries
+REQUIRED_INDEXES = {
+    'AirportStatisticsAPIView:departure_airport': ['airport_stats_route'],
+    'FlightBoardAPIView:departures': ['flight_departure_board'],
+    'FlightBoardAPIView:arrivals': ['flight_arrival_board'],
+    'PassengerSearchAPIView:name': ['ticket_passenger_name_trgm'],
+    'PassengerSearchAPIView:document': ['ticket_passenger_id_norm'],
+    'PassengerSearchAPIView:email': ['ticket_contact_data_gin'],
+    'PassengerSearchAPIView:phone': ['ticket_contact_data_gin'],
+    'signals:ticket_flight_created': ['app_flight_pkey'],
+    'signals:ticket_flight_deleted': ['app_flight_pkey'],
+    'signals:ticket_flight_created:materialized_view': ['app_flight_pkey'],
+    'signals:ticket_flight_deleted:materialized_view': ['app_flight_pkey'],
+}
+
+EXPLAINED_STATEMENTS = ('SELECT', 'UPDATE', 'DELETE', 'INSERT', 'WITH')
+
+
+def format_plan(node, depth=0):
+    """ Render the stable parts of an EXPLAIN (FORMAT JSON) plan as indented lines. """
+    parts = [f"{key}={node[key]}" for key in PLAN_KEYS if key in node]
+    lines = ['  ' * depth + ' '.join(parts)]
+    for child in node.get('Plans', []):
+        lines.extend(format_plan(child, depth + 1))
+    return lines
+
+
+def explain(alias, sql, seqscan=True):
+    with connections[alias].cursor() as cursor:
+        if not seqscan:
+            cursor.execute("SET enable_seqscan = off")
+        try:
+            cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}")
+            plan = cursor.fetchone()[0]
+        finally:
+            if not seqscan:
+                cursor.execute("RESET enable_seqscan")
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return format_plan(plan[0]['Plan'])
+
+
+def generate_dataset(flights_count):
+    """ Airports, flights, bookings, tickets, ticket flights and route statistics consistent with each other. """
+    rng = random.Random(0)
+    start = timezone.now().replace(microsecond=0) - datetime.timedelta(days=180)
+
+    airports = Airport.objects.bulk_create([
+        Airport(airport_code=f"Q{i:02d}", airport_name={'en': f"Airport {i}", 'ru': f"Аэропорт {i}"},
+                city={'en': f"City {i}", 'ru': f"Город {i}"}, timezone='Europe/Moscow')
+        for i in range(60)
+    ])
+    aircraft = Aircraft.objects.create(aircraft_code='Q01', model={'en': 'Test'}, range=5000)
+    Seat.objects.create(aircraft_code=aircraft, seat_no='1A', fare_condition=Seat.FareConditionChoices.ECONOMY)
+
+    flights = []
+    for i in range(flights_count):
+        departure, arrival = rng.sample(airports, 2)
+        scheduled_departure = start + datetime.timedelta(minutes=rng.randint(0, 360 * 24 * 60))
+        flights.append(Flight(
+            flight_id=10_000_000 + i, flight_no=f"QQ{i % 9999:04d}", aircraft_code=aircraft,
+            departure_airport=departure, arrival_airport=arrival,
+            scheduled_departure=scheduled_departure,
+            scheduled_arrival=scheduled_departure + datetime.timedelta(minutes=rng.randint(60, 600)),
+        ))
+
+    # Two flights per ticket, one ticket per booking
+    legs = [rng.sample(flights, 2) for _ in range(flights_count)]
+    for ticket_flights in legs:
+        for flight in ticket_flights:
+            flight.passenger_count += 1
+    Flight.objects.bulk_create(flights, batch_size=5000)
+
+    bookings = Booking.objects.bulk_create([
+        Booking(book_ref=f"Q{i:05X}", book_date=start, total_amount=Decimal('200.00'))
+        for i in range(flights_count)
+    ], batch_size=5000)
+    tickets = Ticket.objects.bulk_create([
+        Ticket(ticket_no=f"Q{i:012d}", book_ref=booking, passenger_id=f"{i:04d} {i:06d}",
+               passenger_name=f"PASSENGER {i}",
+               contact_data={'email': f"passenger{i}@example.com", 'phone': f"+7{i:010d}"})
+        for i, booking in enumerate(bookings)
+    ], batch_size=5000)
+    TicketFlight.objects.bulk_create([
+        TicketFlight(ticket_no=ticket, flight_id=flight, fare_condition=Seat.FareConditionChoices.ECONOMY,
+                     amount=Decimal('100.00'), scheduled_departure=flight.scheduled_departure)
+        for ticket, ticket_flights in zip(tickets, legs) for flight in ticket_flights
+    ], batch_size=5000)
+
+    routes = {}
+    for flight in flights:
+        key = f"{flight.departure_airport_id}-{flight.arrival_airport_id}"
+        if key not in routes:
+            routes[key] = AirportStats(
+                flight_id=key, departure_airport_id=flight.departure_airport_id,
+                arrival_airport_id=flight.arrival_airport_id,
+                departure_airport_name=flight.departure_airport.airport_name,
+                arrival_airport_name=flight.arrival_airport.airport_name,
+                flight_time=flight.scheduled_arrival - flight.scheduled_departure,
+                passengers_count=0, flights_count=0, distance_km=0,
+            )
+        routes[key].flights_count += 1
+        routes[key].passengers_count += flight.passenger_count
+    AirportStats.objects.bulk_create(routes.values())
+
+    # Airports were bulk created, which sends no signals
+    registry.invalidate_airports()
+
+    with connections['default'].cursor() as cursor:
+        cursor.execute("ANALYZE")
+
+    return flights
+
+
+class QueryPlanTests(TestCase):
+    # The primary and the replicas, which mirror it in tests; `demo` is only used by sync_db_to_db
+    databases = {'default', *settings.DATABASE_REPLICAS}
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.baseline = json.loads(BASELINE_PATH.read_text()) if BASELINE_PATH.exists() else {}
+        cls.results = {}
+
+    @classmethod
+    def tearDownClass(cls):
+        if UPDATE_BASELINES and cls.results:
+            baseline = {**cls.baseline, **cls.results}
+            BASELINE_PATH.write_text(json.dumps(dict(sorted(baseline.items())), indent=2, ensure_ascii=False) + '\n')
+        super().tearDownClass()
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.flights = generate_dataset(FLIGHTS_COUNT)
+        cls.user = get_user_model().objects.create_user('query-plan-tests')
+
+    def api_get(self, view, params=None, **kwargs):
+        request = APIRequestFactory().get('/', params or {}, HTTP_ACCEPT_LANGUAGE='en')
+        force_authenticate(request, user=self.user)
+        response = view(request, **kwargs)
+        response.render()
+        self.assertEqual(response.status_code, 200, response.content[:500])
+        return response
+
+    def capture(self, func):
+        """ Run func, returning the (alias, sql) of the queries it ran on every database. """
+        with ExitStack() as stack:
+            contexts = {
+                alias: stack.enter_context(CaptureQueriesContext(connections[alias])) for alias in sorted(self.databases)
+            }
+            func()
+        return [(alias, query['sql']) for alias, context in contexts.items() for query in context.captured_queries]
+
+    def assertQueries(self, name, func):
+        queries = self.capture(func)
+        explained = [(alias, sql) for alias, sql in queries if sql.lstrip().upper().startswith(EXPLAINED_STATEMENTS)]
+
+        plan = []
+        for alias, sql in explained:
+            plan.append(f"{alias}: {sql.split()[0].upper()}")
+            plan.extend('    ' + line for line in explain(alias, sql))
+        self.results[name] = {'queries': len(queries), 'plan': plan}
+
+        index_plans = [line for alias, sql in explained for line in explain(alias, sql, seqscan=False)]
+        for index in REQUIRED_INDEXES.get(name, []):
+            self.assertTrue(
+                any(f"Index Name={index}" in line for line in index_plans),
+                f"{name}: required index {index} is not used:\n" + '\n'.join(index_plans),
+            )
+
+        if UPDATE_BASELINES:
+            return
+
+        expected = self.baseline.get(name)
+        if expected is None:
+            self.skipTest(f"{name}: no recorded baseline, run with UPDATE_QUERY_BASELINES=1")
+
+        self.assertEqual(
+            expected['queries'], len(queries),
+            f"{name}: query count changed\n" + '\n'.join(f"  {alias}: {sql}" for alias, sql in queries),
+        )
+
+        if expected['plan'] != plan:
+            diff = difflib.unified_diff(expected['plan'], plan, 'baseline', 'current', lineterm='')
+            self.fail(f"{name}: query plan changed:\n" + '\n'.join(diff))
+
+    def test_airport_list(self):
+        self.assertQueries('AirportListAPIView', lambda: self.api_get(AirportListAPIView.as_view()))
+
+    def test_airport_statistics(self):
+        view = AirportStatisticsAPIView.as_view()
+        for sort_field in STATS_SORT_FIELDS:
+            for sort_order in (['asc', 'desc'] if sort_field else ['asc']):
+                name = f"AirportStatisticsAPIView:{sort_field or 'unsorted'}:{sort_order}"
+                with self.subTest(name):
+                    self.assertQueries(name, lambda: self.api_get(
+                        view, {'sort_field': sort_field, 'sort_order': sort_order, 'page': 3},
+                    ))
+
+    def test_airport_statistics_filtered(self):
+        self.assertQueries('AirportStatisticsAPIView:departure_airport', lambda: self.api_get(
+            AirportStatisticsAPIView.as_view(), {'departure_airport': 'Q01'},
+        ))
+
+    def test_flight_board(self):
+        flight = self.flights[0]
+        for direction, airport, scheduled in (
+            ('departures', flight.departure_airport_id, flight.scheduled_departure),
+            ('arrivals', flight.arrival_airport_id, flight.scheduled_arrival),
+        ):
+            view = FlightBoardAPIView.as_view(direction=direction)
+            date = scheduled.astimezone(ZoneInfo('Europe/Moscow')).date()
+            with self.subTest(direction):
+                self.assertQueries(f"FlightBoardAPIView:{direction}", lambda: self.api_get(
+                    view, {'date': date.isoformat()}, airport_code=airport,
+                ))
+
+    def test_passenger_search(self):
+        view = PassengerSearchAPIView.as_view()
+        for by, q in (
+            ('name', 'PASSENGER 12'),
+            ('document', '0012 000012'),
+            ('email', 'passenger12@example.com'),
+            ('phone', '+70000000012'),
+        ):
+            with self.subTest(by):
+                self.assertQueries(f"PassengerSearchAPIView:{by}", lambda: self.api_get(view, {'by': by, 'q': q}))
+
+    def check_ticket_flight_signals(self, suffix=''):
+        ticket = Ticket.objects.order_by('ticket_no').first()
+        flight = Flight.objects.get(flight_id=self.flights[0].flight_id)
+
+        def create_ticket_flight():
+            self.ticket_flight = TicketFlight.objects.create(
+                ticket_no=ticket, flight_id=flight,
+                fare_condition=Seat.FareConditionChoices.BUSINESS, amount=Decimal('10.00'),
+            )
+
+        with self.subTest('created'):
+            self.assertQueries(f'signals:ticket_flight_created{suffix}', create_ticket_flight)
+
+        ticket_flight = TicketFlight.objects.get(pk=self.ticket_flight.pk)
+        with self.subTest('deleted'):
+            self.assertQueries(f'signals:ticket_flight_deleted{suffix}', ticket_flight.delete)
+
+    def test_ticket_flight_signals(self):
+        self.check_ticket_flight_signals()
+
+    @override_settings(AIRPORT_STATS_BACKEND='materialized_view')
+    def test_ticket_flight_signals_materialized_view(self):
+        # The receivers only update the flight; airport_stats is left to refresh_airport_stats
+        self.check_ticket_flight_signals(':materialized_view')
+
+    def test_precalculate_flights_count(self):
+        def precalculate_flights_count():
+            # The command reports its progress with print()
+            with redirect_stdout(io.StringIO()):
+                call_command('precalculate_flights_count', stdout=io.StringIO())
+
+        self.assertQueries('precalculate_flights_count', precalculate_flights_count)